@@ -0,0 +1,147 @@
+# =======================
+# IMPORTS
+# =======================
+import io
+import os
+import re
+import threading
+import subprocess
+
+import numpy as np
+
+import probe
+from audio_peaks import SILENCE_DB, PCM_OUTPUT, read_loudness
+from motion import FAST_DECODE, FRAMES_OUTPUT, read_changes
+
+# Both signals are sampled on the same grid: one row every HOP seconds
+# (frames are taken at ANALYSIS_FPS = 1 / HOP per second).
+
+# Bumped whenever the features change meaning, so saved indexes of older
+# analyses are never reused
+ANALYSIS_VERSION = 1
+
+# One row of features per HOP seconds of source (12 bytes per row)
+FEATURES = np.dtype([
+    ("loudness", np.float32),  # dBFS, SILENCE_DB when there is no audio
+    ("motion", np.float32),    # mean absolute pixel change, 0..1
+    ("cuts", np.float32),      # histogram change, close to 1 on a hard cut
+])
+
+
+# The decoder reports how many frames it decoded at the end of a verbose log
+DECODED_RE = re.compile(r"Input stream #\d+:\d+ \(video\):.*?(\d+) frames decoded")
+
+# Input option decoding keyframes only: a few frames per GOP instead of
+# every frame, for a cheap first look at long sources
+KEYFRAMES_ONLY = ["-skip_frame", "nokey"]
+
+
+# =======================
+# SINGLE-PASS DECODE
+# =======================
+def _analysis_cmd(input_video, audio_fd=None, start=None, length=None, keyframes_only=False):
+    # One demux and one decode per stream; gray frames go to stdout and,
+    # if there is audio, PCM to the inherited pipe `audio_fd`
+    cmd = [
+        "ffmpeg", "-v", "verbose", "-nostats",
+        *(KEYFRAMES_ONLY if keyframes_only else FAST_DECODE),
+    ]
+    if start is not None:
+        cmd += ["-ss", f"{start:.3f}", "-t", f"{length:.3f}"]
+
+    cmd += [
+        "-i", input_video,
+        "-map", "0:v:0", *FRAMES_OUTPUT, "pipe:1",
+    ]
+    if audio_fd is not None:
+        cmd += ["-map", "0:a:0", *PCM_OUTPUT, f"pipe:{audio_fd}"]
+    return cmd
+
+
+def _count_decoded(stream, result):
+    # Drains stderr, keeping only the decoder's frame count
+    for line in stream:
+        match = DECODED_RE.search(line)
+        if match:
+            result["decoded"] = int(match.group(1))
+
+
+def analyse(input_video, start=None, length=None, keyframes_only=False):
+    """
+    Decodes the source once and measures loudness, motion and scene cuts.
+
+    A single ffmpeg process writes low-resolution gray frames to stdout and
+    low-rate PCM to a second pipe. Both are consumed at the same time (the
+    audio on a helper thread), so neither output can stall the other.
+
+    Parameters:
+    input_video (str): Source video path
+    start (float | None): Only analyse from here (seconds)...
+    length (float | None): ...for this long
+    keyframes_only (bool): Decode keyframes only; frames in between repeat
+    the last keyframe, so motion shows up at keyframe changes only
+
+    Returns:
+    tuple[np.ndarray, int]: FEATURES array, one row per HOP seconds from
+    `start`, and the number of video frames ffmpeg decoded
+    """
+    audio_fd = write_fd = None
+    if probe.has_audio(input_video):
+        audio_fd, write_fd = os.pipe()
+
+    try:
+        proc = subprocess.Popen(
+            _analysis_cmd(input_video, write_fd, start, length, keyframes_only),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            pass_fds=() if write_fd is None else (write_fd,)
+        )
+    finally:
+        # Only ffmpeg may hold the write end, or the reader never sees EOF
+        if write_fd is not None:
+            os.close(write_fd)
+
+    result = {"decoded": 0}
+    readers = [
+        threading.Thread(
+            target=_count_decoded,
+            args=(io.TextIOWrapper(proc.stderr, errors="replace"), result),
+            daemon=True
+        )
+    ]
+
+    if audio_fd is not None:
+        def read_audio():
+            with os.fdopen(audio_fd, "rb") as stream:
+                result["loudness"] = read_loudness(stream)
+
+        readers.append(threading.Thread(target=read_audio, daemon=True))
+
+    for reader in readers:
+        reader.start()
+
+    try:
+        motion, cuts = read_changes(proc.stdout)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+        for reader in readers:
+            reader.join()
+
+    if returncode != 0:
+        raise Exception("FFmpeg analysis decode failed")
+
+    loudness = result.get("loudness")
+
+    if keyframes_only and loudness is not None and len(loudness) > len(motion):
+        # Frames stop at the last keyframe; the audio still covers the tail
+        pad = np.zeros(len(loudness) - len(motion), dtype=np.float32)
+        motion, cuts = np.concatenate((motion, pad)), np.concatenate((cuts, pad))
+
+    n = len(motion) if loudness is None else min(len(motion), len(loudness))
+
+    features = np.empty(n, dtype=FEATURES)
+    features["loudness"] = SILENCE_DB if loudness is None else loudness[:n]
+    features["motion"] = motion[:n]
+    features["cuts"] = cuts[:n]
+    return features, result["decoded"]
@@ -0,0 +1,66 @@
+# =======================
+# IMPORTS
+# =======================
+import numpy as np
+
+# =======================
+# SETTINGS
+# =======================
+# Loudness needs no more than speech bandwidth; 8 kHz mono keeps the pipe
+# at 16 KB/s of audio, so an hour of source is only ~57 MB of PCM to scan.
+SAMPLE_RATE = 8000
+
+# RMS is measured over hops of this many seconds
+HOP = 0.25
+
+# Bytes read from ffmpeg per iteration (a whole number of hops)
+CHUNK_HOPS = 2400
+
+# Floor for silent hops, so log10 never sees zero
+SILENCE_DB = -90.0
+
+
+# =======================
+# PCM STREAMING
+# =======================
+# Output options turning any audio track into the PCM read_loudness expects
+PCM_OUTPUT = ["-ac", "1", "-ar", str(SAMPLE_RATE), "-f", "s16le"]
+
+
+def read_loudness(stream):
+    """
+    Measures the loudness of a stream of 16-bit mono PCM at SAMPLE_RATE.
+
+    PCM is read in fixed-size chunks, each viewed as a (hops, samples) matrix
+    and reduced to one RMS value per hop, so memory use does not depend on
+    how long the source is.
+
+    Returns:
+    np.ndarray: Loudness in dBFS, one float32 value per HOP seconds
+    """
+    hop_samples = int(SAMPLE_RATE * HOP)
+    chunk_bytes = hop_samples * CHUNK_HOPS * 2
+
+    curves = []
+    carry = b""
+
+    while True:
+        data = stream.read(chunk_bytes)
+        if not data:
+            break
+
+        data = carry + data
+        usable = len(data) - len(data) % (hop_samples * 2)
+        carry = data[usable:]
+
+        if usable:
+            samples = np.frombuffer(data[:usable], dtype="<i2")
+            # Strided view: each row is one hop of samples
+            frames = samples.reshape(-1, hop_samples).astype(np.float32)
+            curves.append(np.sqrt(np.mean(frames * frames, axis=1)))
+
+    if not curves:
+        return np.zeros(0, dtype=np.float32)
+
+    rms = np.concatenate(curves) / 32768.0
+    return np.maximum(20 * np.log10(np.maximum(rms, 1e-12)), SILENCE_DB).astype(np.float32)
@@ -0,0 +1,2 @@
+# Benchmarks reproducing the timings quoted in the commit history.
+# Run from backend/, e.g. `python -m bench.loudness`.
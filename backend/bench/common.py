@@ -0,0 +1,70 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import time
+import tempfile
+import subprocess
+
+# Generated sources are kept between runs; an hour of audio takes a while
+SOURCES_DIR = os.path.join(tempfile.gettempdir(), "clipgen-bench")
+
+
+# =======================
+# SYNTHETIC SOURCES
+# =======================
+def synthetic_source(name, seconds, size="1280x720", fps=30, video=True, audio=True):
+    """
+    Generates a test source with ffmpeg's lavfi inputs, once per name.
+
+    The video is testsrc2 (moving shapes and text, so x264 has real work to
+    do); the audio is a tone whose volume swells and fades over a few
+    seconds, with pink noise underneath, so loudness has peaks to find.
+
+    Returns:
+    str: Path of the generated file
+    """
+    os.makedirs(SOURCES_DIR, exist_ok=True)
+    path = os.path.join(SOURCES_DIR, name)
+    if os.path.exists(path):
+        return path
+
+    cmd = ["ffmpeg", "-v", "error", "-y"]
+    if video:
+        cmd += ["-f", "lavfi", "-i", f"testsrc2=s={size}:r={fps}:d={seconds}"]
+    if audio:
+        cmd += [
+            "-f", "lavfi", "-i", f"sine=f=220:d={seconds}",
+            "-f", "lavfi", "-i", f"anoisesrc=c=pink:a=0.05:d={seconds}",
+            "-filter_complex",
+            "[{0}]volume='0.55+0.45*sin(t/7)':eval=frame[tone];"
+            "[tone][{1}]amix=inputs=2:normalize=0[a]".format(int(video), int(video) + 1),
+            "-map", "[a]", "-c:a", "aac", "-b:a", "96k",
+        ]
+    if video:
+        cmd += ["-map", "0:v", "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p"]
+
+    # Written under a temporary name, so an interrupted run leaves no
+    # truncated source behind
+    partial = path + ".part" + os.path.splitext(path)[1]
+    subprocess.run([*cmd, partial], check=True)
+    os.replace(partial, path)
+    return path
+
+
+def timed(fn, *args, **kwargs):
+    """
+    Runs `fn` once.
+
+    Returns:
+    tuple: (result, seconds taken)
+    """
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def pin_to_one_cpu():
+    """Restricts this process (and the ffmpeg it starts) to a single CPU."""
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {min(os.sched_getaffinity(0))})
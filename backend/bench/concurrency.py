@@ -0,0 +1,74 @@
+"""
+Aggregate clip throughput with 1, 4 and 16 concurrent encode jobs.
+
+Every job renders one clip through a JobScheduler, like /process does,
+either with ffmpeg's default threading or with the pool's thread_budget().
+Reports clips per minute for each worker count and mode.
+
+Usage: python -m bench.concurrency [--jobs 16] [--workers 1 4 16]
+"""
+# =======================
+# IMPORTS
+# =======================
+import os
+import argparse
+import tempfile
+import threading
+
+from clipper import render_clips
+from profiles import get_profile
+from scheduler import JobScheduler, _usable_cpus
+from bench.common import synthetic_source, timed
+
+
+def run(source, folder, workers, jobs, clip_length, budgeted):
+    """Renders `jobs` clips on a pool of `workers` slots; returns when all are done."""
+    pool = JobScheduler(workers=workers, max_queue=jobs, name=f"bench-{workers}")
+    profile = get_profile()
+    done = threading.Semaphore(0)
+
+    def job(job_id):
+        try:
+            # Spread the clips over the source, so the jobs do not all read
+            # the same frames
+            start = (job_id * 3.0) % (30 - clip_length)
+            render_clips(
+                source,
+                [(start, clip_length, os.path.join(folder, f"{job_id}.mp4"))],
+                profile=profile,
+                threads=pool.thread_budget() if budgeted else None
+            )
+        finally:
+            done.release()
+
+    for job_id in range(jobs):
+        pool.submit(job_id, job)
+    for _ in range(jobs):
+        done.acquire()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=16, help="clips rendered per run")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--clip-length", type=float, default=4.0)
+    args = parser.parse_args()
+
+    source = synthetic_source("video_720p_30s.mp4", 30)
+
+    print(f"{args.jobs} clips of {args.clip_length:g} s (standard 9:16), {_usable_cpus()} CPUs")
+    print(f"{'workers':>7} {'default threads':>16} {'thread budget':>14}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for workers in args.workers:
+            rates = []
+            for budgeted in (False, True):
+                _, seconds = timed(run, source, folder, workers, args.jobs,
+                                   args.clip_length, budgeted)
+                rates.append(args.jobs * 60 / seconds)
+
+            print(f"{workers:>7} {rates[0]:>10.1f}/min {rates[1]:>9.1f}/min")
+
+
+if __name__ == "__main__":
+    main()
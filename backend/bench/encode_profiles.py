@@ -0,0 +1,55 @@
+"""
+Encode speed and output size for every quality tier and frame shape.
+
+Cuts the same clip from a 720p source with each profile, the way
+clipper.extract_clip does, and reports encode fps and file size.
+
+Usage: python -m bench.encode_profiles [--clip-length 8] [--threads N]
+"""
+# =======================
+# IMPORTS
+# =======================
+import os
+import argparse
+import tempfile
+import subprocess
+
+from clipper import build_clip_cmd
+from probe import video_stream
+from profiles import QUALITIES, SHAPES, get_profile
+from bench.common import synthetic_source, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clip-length", type=float, default=8.0)
+    parser.add_argument("--threads", type=int, default=None,
+                        help="ffmpeg threads per encode (default: ffmpeg's choice)")
+    args = parser.parse_args()
+
+    source = synthetic_source("video_720p_30s.mp4", 30)
+
+    print(f"{args.clip_length:g} s clip from a 1280x720 30 fps source")
+    print(f"{'profile':<16} {'size':>9} {'fps':>4} {'time':>7} {'enc fps':>8} {'output':>9}")
+
+    with tempfile.TemporaryDirectory() as folder:
+        for quality in QUALITIES:
+            for shape in SHAPES:
+                profile = get_profile(quality, shape)
+                output = os.path.join(folder, "clip.mp4")
+                cmd = build_clip_cmd(source, output, 10.0, args.clip_length, profile, args.threads)
+
+                _, seconds = timed(subprocess.run, [cmd[0], "-v", "error", *cmd[1:]], check=True)
+
+                stream = video_stream(output)
+                frames = int(stream["nb_frames"])
+                fps = QUALITIES[quality]["fps"] or 30
+                print(
+                    f"{profile['name']:<16} {profile['width']:>4}x{profile['height']:<4} "
+                    f"{fps:>4} {seconds:>6.2f}s {frames / seconds:>8.1f} "
+                    f"{os.path.getsize(output) / 1024:>6.0f} KiB"
+                )
+
+
+if __name__ == "__main__":
+    main()
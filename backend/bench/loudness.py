@@ -0,0 +1,62 @@
+"""
+Loudness analysis over a long audio track (audio_peaks.read_loudness).
+
+Decodes the track to 8 kHz mono PCM with ffmpeg and reduces it to one RMS
+value per HOP seconds, on a single CPU. An hour of audio should take a few
+seconds, nearly all of it ffmpeg's decode.
+
+Usage: python -m bench.loudness [--minutes 60]
+"""
+# =======================
+# IMPORTS
+# =======================
+import io
+import argparse
+import subprocess
+
+from audio_peaks import HOP, PCM_OUTPUT, read_loudness
+from selection import select_windows
+from bench.common import synthetic_source, timed, pin_to_one_cpu
+
+
+def _pcm_cmd(path):
+    # The audio half of analysis.analyse's decode
+    return ["ffmpeg", "-v", "error", "-threads", "1", "-i", path, "-vn", *PCM_OUTPUT, "pipe:1"]
+
+
+def decode_pcm(path):
+    return subprocess.run(_pcm_cmd(path), capture_output=True, check=True).stdout
+
+
+def stream_loudness(path):
+    proc = subprocess.Popen(_pcm_cmd(path), stdout=subprocess.PIPE)
+    try:
+        return read_loudness(proc.stdout)
+    finally:
+        proc.stdout.close()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--minutes", type=int, default=60)
+    args = parser.parse_args()
+
+    seconds = args.minutes * 60
+    path = synthetic_source(f"audio_{args.minutes}m.m4a", seconds, video=False)
+    pin_to_one_cpu()
+
+    curve, total = timed(stream_loudness, path)
+    pcm, decode = timed(decode_pcm, path)
+    _, rms = timed(read_loudness, io.BytesIO(pcm))
+    _, select = timed(select_windows, curve, int(round(8 / HOP)), 5)
+
+    print(f"{args.minutes} min of AAC audio, 1 CPU, {len(curve)} hops of {HOP}s")
+    print(f"  decode + loudness (streamed): {total:6.2f} s")
+    print(f"  decode alone:                 {decode:6.2f} s")
+    print(f"  loudness alone ({len(pcm) / 2**20:.0f} MiB PCM):  {rms:6.2f} s")
+    print(f"  top 5 windows of 8 s:         {select * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
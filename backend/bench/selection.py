@@ -0,0 +1,88 @@
+"""
+Top-k window selection over a 10-hour score series (selection.py).
+
+Times the prefix-sum window scores and top_windows, against a greedy pass
+over a full argsort and a naive selector that rescores every window from
+scratch for each pick. The naive selector is quadratic, so it runs on a
+shorter series. tests/test_selection.py checks the picks against it.
+
+Usage: python -m bench.selection [--hours 10] [--naive-hours 0.5]
+"""
+# =======================
+# IMPORTS
+# =======================
+import argparse
+
+import numpy as np
+
+from selection import window_scores, top_windows
+from bench.common import timed
+
+SAMPLES_PER_SECOND = 10
+
+
+def argsort_windows(scores, window, k):
+    # Sorts every start, then marks the starts each pick rules out
+    blocked = np.zeros(len(scores), dtype=bool)
+    chosen = []
+    for start in np.argsort(-scores, kind="stable").tolist():
+        if blocked[start]:
+            continue
+        chosen.append(start)
+        blocked[max(0, start - window + 1):start + window] = True
+        if len(chosen) == k:
+            break
+    return chosen
+
+
+def naive_windows(curve, window, k):
+    # Every pick rescans every start and sums its window again
+    chosen = []
+    for _ in range(k):
+        best, best_score = None, -np.inf
+        for start in range(len(curve) - window + 1):
+            if any(abs(start - other) < window for other in chosen):
+                continue
+            score = curve[start:start + window].sum() / window
+            if score > best_score:
+                best, best_score = start, score
+        if best is None:
+            break
+        chosen.append(best)
+    return chosen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--hours", type=float, default=10)
+    parser.add_argument("--naive-hours", type=float, default=0.5)
+    parser.add_argument("--window", type=float, default=30, help="seconds")
+    parser.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    window = int(args.window * SAMPLES_PER_SECOND)
+
+    curve = rng.random(int(args.hours * 3600 * SAMPLES_PER_SECOND)).astype(np.float32)
+    scores, prefix = timed(window_scores, curve, window)
+    _, fast_time = timed(top_windows, scores, window, args.k)
+    _, full_time = timed(argsort_windows, scores, window, args.k)
+
+    print(f"{args.hours:g} h at {SAMPLES_PER_SECOND}/s: {len(scores)} starts, "
+          f"{args.window:g} s windows, k={args.k}")
+    print(f"  window_scores (prefix sums): {prefix * 1000:8.1f} ms")
+    print(f"  top_windows:                 {fast_time * 1000:8.1f} ms")
+    print(f"  full argsort + mask:         {full_time * 1000:8.1f} ms")
+
+    short = curve[:int(args.naive_hours * 3600 * SAMPLES_PER_SECOND)]
+    short_scores = window_scores(short, window)
+    _, naive_time = timed(naive_windows, short, window, args.k)
+    _, fast_time = timed(top_windows, short_scores, window, args.k)
+
+    print(f"{args.naive_hours:g} h: {len(short_scores)} starts")
+    print(f"  top_windows:                 {fast_time * 1000:8.1f} ms")
+    print(f"  naive rescoring:             {naive_time * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# =======================
+# IMPORTS
+# =======================
+import numpy as np
+
+from probe import has_audio, video_stream, keyframes, duration
+from progress import run_with_progress, summarise
+from profiles import get_profile
+
+# =======================
+# OUTPUT FORMAT
+# =======================
+# Used when no profile is given: standard quality, vertical 9:16
+DEFAULT_PROFILE = get_profile()
+
+# How far before the requested start the coarse input seek lands. ffmpeg
+# jumps straight to the keyframe before that point without decoding, so
+# only this margin (plus at most one GOP) is ever decoded and thrown away.
+SEEK_MARGIN = 5.0
+
+# A stream-copied clip must start on a keyframe; cut points this close to
+# one are moved onto it rather than forcing a re-encode.
+KEYFRAME_SNAP = 0.5
+
+# Clips closer together than this share one ffmpeg process; decoding the gap
+# between them is cheaper than demuxing and seeking the source again.
+MAX_GROUP_GAP = 20.0
+
+
+# =======================
+# COMMAND BUILDING
+# =======================
+def seek_args(start):
+    """
+    Splits a cut point into a fast input seek and an accurate output trim.
+
+    Returns:
+    tuple[list, list]: Arguments to put before and after `-i`
+    """
+    coarse = max(0.0, start - SEEK_MARGIN)
+    fine = start - coarse
+    return ["-ss", f"{coarse:.3f}"], ["-ss", f"{fine:.3f}"]
+
+
+def thread_args(threads, outputs=1):
+    """
+    Caps ffmpeg's threading at `threads`; with None, ffmpeg picks (about
+    1.5x the core count for x264, per process).
+
+    Returns:
+    tuple[list, list]: Arguments to put before `-i` (decoder and filter
+    threads) and after it, once per output (encoder threads; the outputs
+    share the budget)
+    """
+    if not threads:
+        return [], []
+    per_output = max(1, threads // outputs)
+    return (
+        ["-threads", str(threads), "-filter_threads", str(threads),
+         "-filter_complex_threads", str(threads)],
+        ["-threads", str(per_output)]
+    )
+
+
+def build_clip_cmd(input_video, output_path, start, duration, profile=DEFAULT_PROFILE,
+                   threads=None):
+    """
+    Builds the ffmpeg command cutting one clip.
+
+    Parameters:
+    input_video (str): Source video path
+    output_path (str): Where the clip is written
+    start (float): Clip start in seconds
+    duration (float): Clip length in seconds
+    profile (dict): Output settings from profiles.get_profile
+    threads (int | None): CPU threads ffmpeg may use (see thread_args)
+    """
+    before_input, after_input = seek_args(start)
+    input_threads, output_threads = thread_args(threads)
+
+    return [
+        "ffmpeg", "-y",
+        *input_threads,
+        *before_input,
+        "-i", input_video,
+        *after_input,
+        "-t", f"{duration:.3f}",
+        "-vf", profile["filter"],
+        *profile["encode_args"],
+        *output_threads,
+        output_path
+    ]
+
+
+def build_copy_cmd(input_video, output_path, start, duration, profile=DEFAULT_PROFILE):
+    """
+    Builds the ffmpeg command cutting one clip without re-encoding the video.
+
+    The audio is still encoded with the profile's settings: it is cheap, and
+    the source's audio codec (PCM, Opus, ...) may not be one MP4 players
+    accept.
+    """
+    return [
+        "ffmpeg", "-y",
+        # Rounding must not land just before the keyframe, or ffmpeg would
+        # seek back to the previous one
+        "-ss", f"{start + 0.001:.3f}",
+        "-i", input_video,
+        "-t", f"{duration:.3f}",
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c:v", "copy",
+        *profile["audio_args"],
+        "-avoid_negative_ts", "make_zero",
+        "-movflags", "+faststart",
+        output_path
+    ]
+
+
+def can_stream_copy(input_video, profile=DEFAULT_PROFILE):
+    """
+    True if the source's video already matches the output profile (audio
+    is re-encoded either way, see build_copy_cmd).
+    """
+    stream = video_stream(input_video)
+    return (
+        stream is not None
+        and stream.get("codec_name") == "h264"
+        and stream.get("pix_fmt") == "yuv420p"
+        and stream.get("width") == profile["width"]
+        and stream.get("height") == profile["height"]
+        # A profile that resamples the frame rate always needs an encode
+        and "fps=" not in profile["filter"]
+    )
+
+
+def snap_to_keyframes(input_video, start, length):
+    """
+    Moves a clip onto keyframe boundaries if both ends are close to one.
+
+    The end may also fall on the end of the file.
+
+    Returns:
+    tuple[float, float] | None: (start, length) for a stream copy, or None
+    if the clip has to be re-encoded
+    """
+    keys = keyframes(input_video)
+    if not len(keys):
+        return None
+
+    def nearest(t):
+        i = np.clip(np.searchsorted(keys, t), 1, len(keys) - 1)
+        candidates = keys[i - 1:i + 1]
+        best = candidates[np.argmin(np.abs(candidates - t))]
+        return float(best) if abs(best - t) <= KEYFRAME_SNAP else None
+
+    first = nearest(start)
+    end = start + length
+    total = duration(input_video)
+    last = total if total - end <= KEYFRAME_SNAP else nearest(end)
+
+    if first is None or last is None or last <= first:
+        return None
+
+    return first, last - first
+
+
+def group_clips(clips, max_gap=MAX_GROUP_GAP):
+    """
+    Splits clips into runs that are rendered by the same ffmpeg process.
+
+    Parameters:
+    clips (list[tuple]): (start, duration, output_path) per clip
+
+    Returns:
+    list[list[tuple]]: Groups of clips, each sorted by start time
+    """
+    groups = []
+    group_end = None
+
+    for clip in sorted(clips, key=lambda c: c[0]):
+        start, length, _ = clip
+        if groups and start - group_end <= max_gap:
+            groups[-1].append(clip)
+            group_end = max(group_end, start + length)
+        else:
+            groups.append([clip])
+            group_end = start + length
+
+    return groups
+
+
+def build_multi_clip_cmd(input_video, clips, audio=True, profile=DEFAULT_PROFILE, threads=None):
+    """
+    Builds one ffmpeg command rendering every clip of a group.
+
+    The source is decoded once from the first clip's start to the last
+    clip's end; `split`/`asplit` fan the decoded stream out to one
+    trim + scale branch per clip, each mapped to its own output file.
+    """
+    first = min(start for start, _, _ in clips)
+    last = max(start + length for start, length, _ in clips)
+
+    coarse = max(0.0, first - SEEK_MARGIN)
+    n = len(clips)
+    input_threads, output_threads = thread_args(threads, n)
+
+    graph = [f"[0:v]split={n}" + "".join(f"[v{i}]" for i in range(n))]
+    if audio:
+        graph.append(f"[0:a]asplit={n}" + "".join(f"[a{i}]" for i in range(n)))
+
+    outputs = []
+    for i, (start, length, output_path) in enumerate(clips):
+        # Timestamps restart at 0 after the input seek
+        t0 = start - coarse
+        t1 = t0 + length
+
+        graph.append(
+            f"[v{i}]trim=start={t0:.3f}:end={t1:.3f},setpts=PTS-STARTPTS,"
+            f"{profile['filter']}[vo{i}]"
+        )
+        outputs += ["-map", f"[vo{i}]"]
+
+        if audio:
+            graph.append(
+                f"[a{i}]atrim=start={t0:.3f}:end={t1:.3f},asetpts=PTS-STARTPTS[ao{i}]"
+            )
+            outputs += ["-map", f"[ao{i}]"]
+
+        # Keep the source frame timing; filtergraph outputs whose rate ffmpeg
+        # cannot infer after trim would otherwise be resampled to 25 fps.
+        # `-t` because an fps filter after trim pads the clip with its last
+        # frame up to the end of the whole group.
+        outputs += [
+            "-fps_mode", "passthrough", "-t", f"{length:.3f}",
+            *profile["encode_args"], *output_threads, output_path
+        ]
+
+    return [
+        "ffmpeg", "-y",
+        *input_threads,
+        "-ss", f"{coarse:.3f}",
+        # Stop demuxing once the last clip has been covered
+        "-t", f"{last - coarse:.3f}",
+        "-i", input_video,
+        "-filter_complex", ";".join(graph),
+        *outputs
+    ]
+
+
+# =======================
+# CLIP EXTRACTION
+# =======================
+def extract_clip(input_video, output_path, start, duration, on_progress=None,
+                 profile=DEFAULT_PROFILE, threads=None):
+    """Cuts one clip."""
+    run_with_progress(
+        build_clip_cmd(input_video, output_path, start, duration, profile, threads),
+        on_progress
+    )
+
+
+def render_clips(input_video, clips, on_progress=None, profile=DEFAULT_PROFILE, threads=None):
+    """
+    Renders several clips, decoding each region of the source only once.
+
+    Parameters:
+    input_video (str): Source video path
+    clips (list[tuple]): (start, duration, output_path) per clip
+    on_progress (callable | None): Called with a progress.summarise() dict
+    for the whole render as ffmpeg reports progress
+    profile (dict): Output settings from profiles.get_profile
+    threads (int | None): CPU threads each ffmpeg process may use
+    """
+    audio = has_audio(input_video)
+
+    # Fast path: keyframe-aligned clips of a source that already matches the
+    # output format are copied, not re-encoded
+    copies, encodes = [], []
+    copyable = can_stream_copy(input_video, profile)
+
+    for start, length, output_path in clips:
+        snapped = snap_to_keyframes(input_video, start, length) if copyable else None
+        if snapped:
+            copies.append((*snapped, output_path))
+        else:
+            encodes.append((start, length, output_path))
+
+    for start, length, output_path in copies:
+        run_with_progress(build_copy_cmd(input_video, output_path, start, length, profile))
+
+    groups = group_clips(encodes)
+
+    # ffmpeg reports the furthest output timestamp, so a group is complete
+    # once its longest clip has been written.
+    spans = [max(length for _, length, _ in group) for group in groups]
+    total = sum(spans)
+    done = 0.0
+
+    for group, span in zip(groups, spans):
+        def report(stats, base=done, span=span):
+            if on_progress:
+                on_progress(summarise(base + min(stats["time"], span), total, stats))
+
+        if len(group) == 1:
+            start, length, output_path = group[0]
+            extract_clip(input_video, output_path, start, length, report, profile, threads)
+        else:
+            run_with_progress(
+                build_multi_clip_cmd(input_video, group, audio, profile, threads),
+                report
+            )
+
+        done += span
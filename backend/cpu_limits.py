@@ -0,0 +1,97 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import ctypes
+import platform
+
+# ioprio_set(2) has no Python wrapper; its syscall number per architecture
+IOPRIO_SET = {"x86_64": 251, "aarch64": 30}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASSES = {"best-effort": 2, "idle": 3}
+
+
+# =======================
+# SETTINGS
+# =======================
+def parse_cpu_list(text):
+    """
+    Parses a CPU list in taskset/cpuset syntax, e.g. "1-3,6".
+
+    Returns:
+    set[int] | None: CPU numbers, or None for an empty string
+    """
+    cpus = set()
+
+    for part in text.replace(" ", "").split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.update(range(int(first), int(last or first) + 1))
+
+    return cpus or None
+
+
+def encode_limits_from_env():
+    """
+    Reads the priority settings applied to encode workers.
+
+    ENCODE_CPUS: CPUs the encodes may run on (default: all of them)
+    ENCODE_NICE: Nice increment, 0-19 (default: 10)
+    ENCODE_IONICE: "best-effort:<0-7>", "idle" or "none" (default: best-effort:7)
+    """
+    ionice = os.environ.get("ENCODE_IONICE", "best-effort:7")
+    io_class, _, io_level = ionice.partition(":")
+
+    return {
+        "cpus": parse_cpu_list(os.environ.get("ENCODE_CPUS", "")),
+        "nice": int(os.environ.get("ENCODE_NICE", 10)),
+        "io_class": None if io_class == "none" else io_class,
+        "io_level": int(io_level or 7),
+    }
+
+
+# =======================
+# APPLYING
+# =======================
+def _set_ioprio(io_class, level):
+    number = IOPRIO_SET.get(platform.machine())
+    if number is None:
+        raise OSError(f"ioprio_set unknown on {platform.machine()}")
+
+    value = (IOPRIO_CLASSES[io_class] << IOPRIO_CLASS_SHIFT) | (level if io_class != "idle" else 0)
+
+    libc = ctypes.CDLL(None, use_errno=True)
+    # who = 0 is the calling thread
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, value) != 0:
+        raise OSError(ctypes.get_errno(), "ioprio_set failed")
+
+
+def apply_limits(limits):
+    """
+    Applies `limits` from encode_limits_from_env() to the calling thread.
+
+    On Linux CPU affinity, nice and I/O priority are all per thread and are
+    inherited by child processes, so calling this at the start of a worker
+    thread covers every ffmpeg that worker launches, while the event loop
+    thread keeps full priority. Settings the platform does not support are
+    skipped with a message.
+    """
+    if limits["cpus"]:
+        try:
+            os.sched_setaffinity(0, limits["cpus"])
+        except (AttributeError, OSError) as e:
+            print("Could not set CPU affinity:", e)
+
+    if limits["nice"]:
+        try:
+            os.setpriority(os.PRIO_PROCESS, 0, os.getpriority(os.PRIO_PROCESS, 0) + limits["nice"])
+        except (AttributeError, OSError) as e:
+            print("Could not lower CPU priority:", e)
+
+    if limits["io_class"]:
+        try:
+            _set_ioprio(limits["io_class"], limits["io_level"])
+        except (KeyError, OSError) as e:
+            print("Could not lower I/O priority:", e)
@@ -0,0 +1,243 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import json
+import shutil
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from storage import UPLOAD_CHUNK
+
+# Query parameters that never change which video a link points to
+TRACKING_PARAMS = {"si", "feature", "fbclid", "gclid", "igshid", "ref", "t"}
+
+
+# =======================
+# CACHE KEYS
+# =======================
+def normalize_url(url):
+    """
+    Canonical form of a video URL, so trivially different links to the same
+    video share a cache entry.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.").removeprefix("m.")
+    path = parts.path.rstrip("/") or "/"
+
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k not in TRACKING_PARAMS and not k.startswith("utm_")
+    ]
+
+    # youtu.be/<id> is the same video as youtube.com/watch?v=<id>
+    if host == "youtu.be":
+        host, query = "youtube.com", [("v", path.strip("/")), *query]
+        path = "/watch"
+
+    return urlunsplit(("https", host, path, urlencode(sorted(query)), ""))
+
+
+def cache_key(url, *spec):
+    """Cache key for a URL downloaded with the given format/sections spec."""
+    raw = json.dumps([normalize_url(url), *spec])
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+# =======================
+# DOWNLOAD CACHE
+# =======================
+class DownloadCache:
+    """
+    Disk cache of finished downloads with a size budget.
+
+    Every entry is a folder holding the downloaded files plus a `meta.json`
+    listing them with their SHA-256. Entries are evicted least recently used
+    first once the cache grows past `max_bytes`.
+
+    Concurrent requests for the same key are coalesced: the first caller
+    downloads, everyone else waits for it and shares the result.
+
+    Parameters:
+    root (str): Cache folder
+    max_bytes (int): Disk budget for all entries together
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+        os.makedirs(root, exist_ok=True)
+
+    # -----------------------
+    # LOOKUP
+    # -----------------------
+    def _meta_path(self, key):
+        return os.path.join(self.root, key, "meta.json")
+
+    def get(self, key):
+        """
+        Returns the cached files for `key` as a list of (path, sha256), or
+        None on a miss.
+        """
+        try:
+            with open(self._meta_path(key)) as f:
+                files = json.load(f)["files"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+
+        entry = os.path.join(self.root, key)
+        result = [(os.path.join(entry, name), digest) for name, digest in files]
+
+        if not all(os.path.isfile(path) for path, _ in result):
+            return None
+
+        # Mark as recently used; an eviction may just have removed it
+        try:
+            os.utime(self._meta_path(key))
+        except FileNotFoundError:
+            return None
+        return result
+
+    def get_or_fetch(self, key, fetch, link=None):
+        """
+        Returns the cached files for `key`, downloading them on a miss.
+
+        Parameters:
+        key (str): From cache_key()
+        fetch (callable): fetch(folder) downloads into `folder` and returns
+        the list of file paths, or None on failure
+        link (callable | None): link(path, sha256) is called on every file
+        while no eviction can run, and its return value replaces the path;
+        use it to link the files somewhere outside the cache
+
+        Returns:
+        list[tuple[str, str]] | None: (path, sha256) per file
+        """
+        # A fresh entry can still lose to another download's eviction
+        # before it is linked; the second round fetches it again
+        for _ in range(2):
+            with self._lock:
+                result = self.get(key)
+                if result:
+                    return self._link(result, link)
+
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = self._inflight[key] = {"done": threading.Event(), "result": None}
+
+            if not leader:
+                flight["done"].wait()
+            else:
+                try:
+                    flight["result"] = self._fetch(key, fetch)
+                finally:
+                    with self._lock:
+                        del self._inflight[key]
+                    flight["done"].set()
+
+            if not flight["result"]:
+                return None
+
+            with self._lock:
+                result = self.get(key)
+                if result:
+                    return self._link(result, link)
+
+        return None
+
+    def _link(self, result, link):
+        if link is None:
+            return result
+        return [(link(path, digest), digest) for path, digest in result]
+
+    # -----------------------
+    # FILLING
+    # -----------------------
+    def _fetch(self, key, fetch):
+        # Returns True once the entry for `key` is in place
+        tmp = os.path.join(self.root, f".{key}.{threading.get_ident()}")
+        os.makedirs(tmp, exist_ok=True)
+
+        try:
+            paths = fetch(tmp)
+            if not paths:
+                return None
+
+            files = []
+            for path in paths:
+                digest = hashlib.sha256()
+                with open(path, "rb") as f:
+                    while chunk := f.read(UPLOAD_CHUNK):
+                        digest.update(chunk)
+                files.append((os.path.relpath(path, tmp), digest.hexdigest()))
+
+            with open(os.path.join(tmp, "meta.json"), "w") as f:
+                json.dump({"files": files}, f)
+
+            entry = os.path.join(self.root, key)
+            with self._lock:
+                shutil.rmtree(entry, ignore_errors=True)
+                os.replace(tmp, entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        self.evict(keep=key)
+        return True
+
+    # -----------------------
+    # EVICTION
+    # -----------------------
+    def evict(self, keep=None):
+        """
+        Deletes least recently used entries until the budget is met, never
+        touching the entry for `keep` (which still counts towards the
+        budget).
+        """
+        with self._lock:
+            self._evict(keep)
+
+    def _evict(self, keep):
+        entries = []
+        total = 0
+
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if not entry.is_dir() or entry.name.startswith("."):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                total += size
+                if entry.name == keep:
+                    continue
+                try:
+                    used = os.stat(os.path.join(entry.path, "meta.json")).st_mtime
+                except FileNotFoundError:
+                    used = 0
+                entries.append((used, size, entry.path))
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def link_or_copy(src, dst):
+    """
+    Makes `dst` a hard link to `src` (no data copied); falls back to a
+    copy across filesystems.
+    """
+    if not os.path.exists(dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copyfile(src, dst)
+
+    # Counts as a fresh use for prune_uploads
+    os.utime(dst)
+    return dst
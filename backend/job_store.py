@@ -0,0 +1,366 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+# Jobs in these states never change again and may be evicted
+FINISHED_STATUSES = ("done", "error")
+
+# Every process using the SQLite store checks in this often; jobs owned by
+# a process silent for ORPHAN_AFTER seconds can never finish and are failed
+HEARTBEAT_INTERVAL = 10
+ORPHAN_AFTER = 60
+
+
+# =======================
+# INTERFACE
+# =======================
+class JobStore:
+    """
+    Where job records live.
+
+    A job record is a plain JSON-serialisable dict with at least a "status"
+    key. Implementations must be safe to call from worker threads and from
+    the request handlers at the same time.
+    """
+
+    def get(self, job_id):
+        """Returns the job dict, or None if the job is unknown."""
+        raise NotImplementedError
+
+    def put(self, job_id, job):
+        """Replaces the whole job record."""
+        raise NotImplementedError
+
+    def update(self, job_id, **fields):
+        """Merges `fields` into the existing job record."""
+        job = self.get(job_id) or {}
+        job.update(fields)
+        self.put(job_id, job)
+
+    def delete(self, job_id):
+        raise NotImplementedError
+
+    def purge(self, max_age):
+        """Drops finished jobs that have not changed for `max_age` seconds."""
+        raise NotImplementedError
+
+    def fail_orphans(self):
+        """
+        Marks as "error" the unfinished jobs whose process has gone away, so
+        clients stop waiting for them. Nothing to do for stores that do not
+        outlive their process.
+        """
+
+
+# =======================
+# IN-MEMORY STORE
+# =======================
+class MemoryJobStore(JobStore):
+    """
+    Process-local store, handy for development and single-worker setups.
+    Finished jobs are still evicted so memory stays flat.
+    """
+
+    def __init__(self, ttl=24 * 3600):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._last_purge = time.monotonic()
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            return dict(entry[0]) if entry else None
+
+    def put(self, job_id, job):
+        with self._lock:
+            self._jobs[job_id] = (dict(job), time.time())
+
+        if time.monotonic() - self._last_purge > 60:
+            self.purge(self.ttl)
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = dict(self._jobs.get(job_id, ({}, 0))[0])
+            job.update(fields)
+            self._jobs[job_id] = (job, time.time())
+
+    def delete(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def purge(self, max_age):
+        cutoff = time.time() - max_age
+        with self._lock:
+            self._last_purge = time.monotonic()
+            stale = [
+                job_id for job_id, (job, updated_at) in self._jobs.items()
+                if job.get("status") in FINISHED_STATUSES and updated_at < cutoff
+            ]
+            for job_id in stale:
+                del self._jobs[job_id]
+
+
+# =======================
+# SQLITE STORE
+# =======================
+class SQLiteJobStore(JobStore):
+    """
+    Job store shared by every uvicorn worker through one SQLite file.
+
+    The database runs in WAL mode so readers never block the writer. Writes
+    are buffered and committed in batches by a background thread every
+    `flush_interval` seconds, which keeps frequent progress updates from
+    turning into one fsync each. Reads see the local write buffer first, so
+    a worker always reads its own writes immediately.
+
+    Every row records which process wrote it, and every process sends a
+    heartbeat; unfinished jobs of a process that stopped (a restart or a
+    crash) are marked "error" at startup and then once a minute.
+
+    Parameters:
+    path (str): SQLite database file
+    ttl (int): Seconds after which finished jobs are deleted
+    flush_interval (float): Maximum delay before buffered writes are committed
+    """
+
+    def __init__(self, path, ttl=24 * 3600, flush_interval=0.05):
+        self.path = path
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+
+        self._local = threading.local()
+        self._pending = {}
+        self._inflight = {}
+        self._deleted = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher = None
+
+        # Identifies this process's rows and heartbeats
+        self.owner = uuid.uuid4().hex
+
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id     TEXT PRIMARY KEY,
+                    status     TEXT NOT NULL,
+                    data       TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status_updated
+                    ON jobs (status, updated_at);
+                CREATE TABLE IF NOT EXISTS workers (
+                    owner TEXT PRIMARY KEY,
+                    seen  REAL NOT NULL
+                );
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+        self.heartbeat()
+        self.fail_orphans()
+
+    # -----------------------
+    # CONNECTIONS
+    # -----------------------
+    def _connect(self):
+        # sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # -----------------------
+    # READS
+    # -----------------------
+    def get(self, job_id):
+        with self._lock:
+            # Buffered writes first, then the batch currently being committed
+            entry = self._pending.get(job_id) or self._inflight.get(job_id)
+            if entry:
+                return dict(entry[0])
+            if job_id in self._deleted:
+                return None
+
+        row = self._connect().execute(
+            "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # -----------------------
+    # WRITES
+    # -----------------------
+    def put(self, job_id, job):
+        with self._lock:
+            self._deleted.discard(job_id)
+            self._pending[job_id] = (dict(job), time.time())
+        self._schedule_flush()
+
+    def update(self, job_id, **fields):
+        # Look up and merge under one lock acquisition, so the flusher cannot
+        # move the record out of the buffer in between and two threads
+        # updating the same job never lose each other's fields.
+        with self._lock:
+            entry = self._pending.get(job_id) or self._inflight.get(job_id)
+
+            if entry:
+                job = dict(entry[0])
+            elif job_id in self._deleted:
+                job = {}
+            else:
+                # Neither buffered nor being committed, so the database row
+                # is current; read it while holding the lock so it stays so
+                row = self._connect().execute(
+                    "SELECT data FROM jobs WHERE job_id = ?", (job_id,)
+                ).fetchone()
+                job = json.loads(row[0]) if row else {}
+
+            job.update(fields)
+            self._deleted.discard(job_id)
+            self._pending[job_id] = (job, time.time())
+        self._schedule_flush()
+
+    def delete(self, job_id):
+        with self._lock:
+            self._pending.pop(job_id, None)
+            self._deleted.add(job_id)
+        self._schedule_flush()
+
+    def purge(self, max_age):
+        with self._connect() as conn:
+            conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(FINISHED_STATUSES))})"
+                " AND updated_at < ?",
+                (*FINISHED_STATUSES, time.time() - max_age)
+            )
+
+    def heartbeat(self):
+        """Records that this process is alive (see fail_orphans)."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workers (owner, seen) VALUES (?, ?)",
+                (self.owner, now)
+            )
+            conn.execute("DELETE FROM workers WHERE seen < ?", (now - ORPHAN_AFTER,))
+
+    def fail_orphans(self):
+        finished = ",".join("?" * len(FINISHED_STATUSES))
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'error',"
+                " data = json_set(data, '$.status', 'error'), updated_at = ?"
+                f" WHERE status NOT IN ({finished})"
+                " AND (owner IS NULL OR owner NOT IN"
+                "      (SELECT owner FROM workers WHERE seen >= ?))",
+                (time.time(), *FINISHED_STATUSES, time.time() - ORPHAN_AFTER)
+            )
+
+    def flush(self):
+        """Commits every buffered write in a single transaction."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            deleted, self._deleted = self._deleted, set()
+            self._inflight = pending
+
+        if not pending and not deleted:
+            return
+
+        rows = [
+            (job_id, job.get("status", ""), json.dumps(job), updated_at, self.owner)
+            for job_id, (job, updated_at) in pending.items()
+        ]
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO jobs (job_id, status, data, updated_at, owner)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.executemany(
+                "DELETE FROM jobs WHERE job_id = ?",
+                [(job_id,) for job_id in deleted]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            # Put the batch back so the next flush retries it, without
+            # clobbering anything written in the meantime.
+            with self._lock:
+                for job_id, entry in pending.items():
+                    self._pending.setdefault(job_id, entry)
+                self._deleted |= deleted - set(self._pending)
+            raise
+        finally:
+            with self._lock:
+                self._inflight = {}
+
+    # -----------------------
+    # BACKGROUND FLUSHER
+    # -----------------------
+    def _schedule_flush(self):
+        if self._flusher is None:
+            with self._lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(
+                        target=self._flush_loop,
+                        name="job-store-flush",
+                        daemon=True
+                    )
+                    self._flusher.start()
+        self._wake.set()
+
+    def _flush_loop(self):
+        last_purge = 0.0
+        last_heartbeat = 0.0
+
+        while True:
+            # Wake up for the heartbeat even when nothing is being written
+            if self._wake.wait(HEARTBEAT_INTERVAL):
+                # Give concurrent writers a moment to join the same batch
+                time.sleep(self.flush_interval)
+                self._wake.clear()
+
+            try:
+                # Before the first flush, so no other process ever sees
+                # this one's jobs without a recent heartbeat
+                if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                    self.heartbeat()
+                    last_heartbeat = time.monotonic()
+                self.flush()
+                if time.monotonic() - last_purge > 60:
+                    self.fail_orphans()
+                    self.purge(self.ttl)
+                    last_purge = time.monotonic()
+            except Exception as e:
+                print("Job store flush failed:", e)
+
+
+# =======================
+# FACTORY
+# =======================
+def create_job_store(base_dir):
+    """
+    Builds the job store selected by the JOB_STORE environment variable
+    ("sqlite" by default, or "memory").
+    """
+    ttl = int(os.environ.get("JOB_TTL", 24 * 3600))
+
+    if os.environ.get("JOB_STORE", "sqlite") == "memory":
+        return MemoryJobStore(ttl=ttl)
+
+    path = os.environ.get("JOB_DB", os.path.join(base_dir, "jobs.db"))
+    return SQLiteJobStore(path, ttl=ttl)
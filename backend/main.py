@@ -1,11 +1,32 @@
 import os
+import re
+import json
+import time
 import uuid
+import asyncio
 import threading
-import subprocess
+from collections import Counter
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from scheduler import JobScheduler, QueueFull
+from cpu_limits import encode_limits_from_env, apply_limits
+from job_store import create_job_store
+from clipper import render_clips, can_stream_copy
+from profiles import QUALITIES, SHAPES, DEFAULT_QUALITY, DEFAULT_SHAPE, get_profile
+from peaks import rank_windows, snap_windows, refine_regions
+from analysis import ANALYSIS_VERSION, analyse
+from media import MediaFileResponse
+from storage import (
+    save_upload, prune_uploads, content_hash_of, clip_key, load_manifest, save_manifest,
+    load_features, save_features
+)
+from url_handler import VIDEO_FORMAT, download_video, fetch_info, choose_sections, download_sections
+from download_cache import DownloadCache, cache_key, link_or_copy
+import probe
 
 # =======================
 # PATHS
@@ -13,9 +34,44 @@ from fastapi.responses import RedirectResponse, FileResponse
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
 CLIPS_DIR = os.path.join(BASE_DIR, "clips")
+CACHE_DIR = os.path.join(BASE_DIR, "cache")
+FEATURES_DIR = os.path.join(BASE_DIR, "features")
 
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(CLIPS_DIR, exist_ok=True)
+os.makedirs(FEATURES_DIR, exist_ok=True)
+
+# Uploads are kept under their SHA-256 so identical videos share one file;
+# ones no job has touched for UPLOAD_TTL seconds are deleted.
+UPLOAD_TTL = int(os.environ.get("UPLOAD_TTL", 3600))
+
+# Inputs of the jobs waiting for or running on this process's encode pool;
+# pruning leaves them alone however long they sit in the queue
+pending_inputs = Counter()
+pending_lock = threading.Lock()
+
+def hold_inputs(paths):
+    with pending_lock:
+        pending_inputs.update(paths)
+
+def release_inputs(paths):
+    global pending_inputs
+    with pending_lock:
+        # Subtraction drops the paths no job holds any more
+        pending_inputs -= Counter(paths)
+
+# Analysis results are tiny (~170 KB per hour of video) and outlive the
+# uploads, so re-clipping a video sent again later skips analysis.
+FEATURES_TTL = int(os.environ.get("FEATURES_TTL", 30 * 86400))
+
+# Render low-resolution draft clips first so results show up early
+PREVIEW_CLIPS = os.environ.get("PREVIEW_CLIPS", "1") != "0"
+
+# Finished downloads, keyed by normalised URL, shared by every job
+download_cache = DownloadCache(
+    CACHE_DIR,
+    max_bytes=int(os.environ.get("DOWNLOAD_CACHE_MB", 5120)) * 1024 * 1024
+)
 
 # =======================
 # APP
@@ -29,89 +85,491 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-jobs = {}
+# Shared by every uvicorn worker (see job_store.py)
+jobs = create_job_store(BASE_DIR)
+
+# =======================
+# WORKER POOL
+# =======================
+# At most ENCODE_WORKERS ffmpeg encodes run at once; up to MAX_QUEUE more
+# wait in FIFO order, after which /process answers 429 with Retry-After.
+# Encode workers run on ENCODE_CPUS at lowered CPU and I/O priority, so
+# /status and /stream stay responsive while they are busy.
+encode_limits = encode_limits_from_env()
+
+encode_pool = JobScheduler(
+    workers=int(os.environ.get("ENCODE_WORKERS", 0)) or None,
+    max_queue=int(os.environ.get("MAX_QUEUE", 100)),
+    name="encode",
+    on_start=lambda: apply_limits(encode_limits)
+)
+
+# CPU threads the running encodes share between them (default: every usable
+# core); each ffmpeg gets an equal slice instead of its own default pool.
+ENCODE_THREADS = int(os.environ.get("ENCODE_THREADS", 0)) or None
+
+# Downloads are network-bound, so they get their own pool: a slow download
+# only ever holds a download slot, never an encoder slot.
+download_pool = JobScheduler(
+    workers=int(os.environ.get("DOWNLOAD_WORKERS", 4)),
+    max_queue=int(os.environ.get("MAX_QUEUE", 100)),
+    name="download"
+)
 
 # =======================
 # VIDEO PROCESSING
 # =======================
-def process_video(job_id, input_video):
-    try:
-        jobs[job_id]["status"] = "processing"
-
-        clip_name = f"{job_id}_clip1.mp4"
-        output_path = os.path.join(CLIPS_DIR, clip_name)
-
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", input_video,
-            "-ss", "2",
-            "-t", "8",
-            "-vf", "scale=720:1280:force_original_aspect_ratio=decrease,pad=720:1280:(ow-iw)/2:(oh-ih)/2",
-            "-c:v", "libx264",
-            "-preset", "veryfast",
-            "-crf", "28",
-            "-pix_fmt", "yuv420p",
-            "-movflags", "+faststart",
-            output_path
-        ]
-
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-
-        if result.returncode != 0:
-            print(result.stderr.decode())
-            raise Exception("FFmpeg failed")
-
-        jobs[job_id] = {
-            "status": "done",
-            "clips": [{
-                "name": "Clip 1",
-                "url": f"{BASE_URL}/stream/{clip_name}"
-            }]
+def video_features(input_video, clip_count, clip_length, analysis="full"):
+    """
+    Analysis features of a stored source, computed once per content hash
+    and then read back from the feature index.
+
+    In "coarse" mode the source is first scanned keyframes only (that scan
+    is indexed too), and then only the regions around likely clips are
+    decoded in full. A full index, when one exists, is always used instead.
+
+    Returns:
+    tuple[np.ndarray, np.ndarray | None, int]: Features, the mask of rows
+    analysed in full (None for all of them) and the video frames decoded
+    """
+    name = f"{content_hash_of(input_video)}.v{ANALYSIS_VERSION}"
+
+    features = load_features(FEATURES_DIR, name)
+    if features is not None:
+        return features, None, 0
+
+    decoded = 0
+
+    if analysis == "coarse":
+        coarse = load_features(FEATURES_DIR, f"{name}.coarse")
+        if coarse is None:
+            coarse, decoded = analyse(input_video, keyframes_only=True)
+            save_features(FEATURES_DIR, f"{name}.coarse", coarse)
+
+        refined = refine_regions(input_video, coarse, clip_length, clip_count)
+        if refined:
+            features, valid, frames = refined
+            return features, valid, decoded + frames
+
+    features, frames = analyse(input_video)
+    save_features(FEATURES_DIR, name, features)
+    return features, None, decoded + frames
+
+def pick_windows(input_video, clip_count, clip_length, analysis="full"):
+    """
+    Chooses clip start times, best moment first.
+
+    Uses the loudest and busiest stretches of the video, with the edges
+    moved onto nearby shot changes and pauses; if it is too short to
+    analyse, the windows are spread evenly instead.
+
+    Returns:
+    tuple[list[tuple[float, float]], int]: (start, length) per clip, and
+    the video frames decoded to find them
+    """
+    total = probe.duration(input_video)
+    clip_length = min(clip_length, total)
+
+    features, valid, decoded = video_features(input_video, clip_count, clip_length, analysis)
+    peaks = rank_windows(features, clip_length, clip_count, valid=valid)
+    if peaks:
+        return snap_windows(features, [(start, clip_length) for start, _ in peaks]), decoded
+
+    step = (total - clip_length) / (clip_count + 1)
+    return [(step * (i + 1), clip_length) for i in range(clip_count)], decoded
+
+def clip_links(names, label="Clip"):
+    return [
+        {
+            "name": f"{label} {i + 1}",
+            "url": f"{BASE_URL}/stream/{name}"
         }
+        for i, name in enumerate(names)
+    ]
+
+def clips_result(names):
+    return {"status": "done", "clips": clip_links(names)}
+
+def render_plan(job_id, plan, names, profile, tmp_paths):
+    """
+    Renders every clip in `plan` with one profile and files them under
+    `names`, reporting progress on the job.
 
-        os.remove(input_video)
+    Clips are rendered under private names and then renamed: a clip name
+    only ever refers to a complete file, which is what lets /stream cache
+    it. The private paths are appended to `tmp_paths` for cleanup.
+    """
+    paths = [os.path.join(CLIPS_DIR, f".{job_id}_{name}") for name in names]
+    tmp_paths.extend(paths)
+
+    rendered = 0
+    for i, (input_video, windows) in enumerate(plan):
+        def report(p, done=i):
+            # Scale each source's progress to its share of the job
+            if p["percent"] is not None:
+                p = {**p, "percent": round((done * 100 + p["percent"]) / len(plan), 1)}
+            jobs.update(job_id, progress=p)
+
+        render_clips(
+            input_video,
+            [
+                (start, length, tmp_path)
+                for (start, length), tmp_path in zip(windows, paths[rendered:])
+            ],
+            on_progress=report,
+            profile=profile,
+            # Re-read per source: the share shrinks as more jobs start
+            threads=encode_pool.thread_budget(ENCODE_THREADS)
+        )
+        rendered += len(windows)
+
+    for name, tmp_path in zip(names, paths):
+        os.replace(tmp_path, os.path.join(CLIPS_DIR, name))
+
+def wants_preview(plan, quality, shape):
+    """
+    Whether draft previews are worth rendering before the final clips:
+    not when the final clips are drafts already, and not when every source
+    can be cut without re-encoding (the final clips are then nearly instant).
+    """
+    if not PREVIEW_CLIPS or quality == "draft":
+        return False
+    profile = get_profile(quality, shape)
+    return not all(can_stream_copy(input_video, profile) for input_video, _ in plan)
+
+def process_video(job_id, input_videos, key, clip_count=3, clip_length=8,
+                  quality=DEFAULT_QUALITY, shape=DEFAULT_SHAPE, analysis="full"):
+    """
+    Finds peaks in and renders clips from one source video, or from several
+    downloaded sections of one video (one clip per section).
+
+    Cheap draft previews of every clip are rendered first and published on
+    the job as "previews", so the user sees results while the final clips
+    are still encoding.
+    """
+    tmp_paths = []
+    preview_names = []
+
+    try:
+        jobs.update(job_id, status="processing")
+
+        # Counts as a fresh use, so other workers' pruning keeps the input
+        # for the whole job
+        for input_video in input_videos:
+            os.utime(input_video)
+
+        per_source = clip_count if len(input_videos) == 1 else 1
+        plan = []
+        decoded = 0
+
+        for input_video in input_videos:
+            windows, frames = pick_windows(input_video, per_source, clip_length, analysis)
+            plan.append((input_video, windows))
+            decoded += frames
+
+        count = sum(len(windows) for _, windows in plan)
+
+        # Frames decoded for analysis (0 when the feature index had them)
+        metrics = {"analysis": analysis, "decoded_frames": decoded}
+        jobs.update(job_id, metrics=metrics)
+
+        if wants_preview(plan, quality, shape):
+            jobs.update(job_id, status="previewing")
+
+            # Named after the job, not the clip key: previews are thrown
+            # away once the final clips exist.
+            preview_names = [f"{job_id}_preview{i + 1}.mp4" for i in range(count)]
+            render_plan(job_id, plan, preview_names, get_profile("draft", shape), tmp_paths)
+
+            jobs.update(job_id, previews=clip_links(preview_names, "Preview"), progress=None)
+
+        jobs.update(job_id, status="rendering")
+
+        names = [f"{key}_clip{i + 1}.mp4" for i in range(count)]
+        render_plan(job_id, plan, names, get_profile(quality, shape), tmp_paths)
+        save_manifest(CLIPS_DIR, key, names)
+
+        jobs.put(job_id, {**clips_result(names), "metrics": metrics})
 
     except Exception as e:
         print("ERROR:", e)
-        jobs[job_id] = {"status": "error"}
+        jobs.put(job_id, {"status": "error"})
+
+    finally:
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        for name in preview_names:
+            path = os.path.join(CLIPS_DIR, name)
+            if os.path.exists(path):
+                os.remove(path)
+        release_inputs(input_videos)
+        maybe_prune_uploads()
+
+def download_and_process(job_id, url, clip_count, clip_length, mode="full",
+                         quality=DEFAULT_QUALITY, shape=DEFAULT_SHAPE, analysis="full"):
+    """
+    Runs on the download pool, then hands the video to the encode pool.
+
+    In "sections" mode only the parts of the video around likely clips are
+    downloaded, using the site's metadata to decide which parts.
+    """
+    jobs.update(job_id, status="downloading")
+
+    try:
+        sections = None
+
+        if mode == "sections":
+            info = fetch_info(url)
+            if not info:
+                raise Exception("Could not read video info")
+
+            sections = choose_sections(info, clip_length, clip_count)
+            if len(sections) == 1:
+                sections = None
+
+        def report(p):
+            jobs.update(job_id, download=p)
+
+        def fetch(folder):
+            if sections:
+                return download_sections(url, folder, sections, report)
+            path = download_video(url, folder, report)
+            return [path] if path else None
+
+        def link(path, digest):
+            return link_or_copy(path, os.path.join(UPLOADS_DIR, f"{digest}.mp4"))
+
+        # Popular links are downloaded once and shared by every job; the
+        # files are linked into uploads/ before any eviction can remove them
+        cached = download_cache.get_or_fetch(
+            cache_key(url, VIDEO_FORMAT, sections or "full"),
+            fetch,
+            link
+        )
+        if not cached:
+            raise Exception("Download failed")
+
+        input_paths = [path for path, _ in cached]
+        content_hash = ":".join(digest for _, digest in cached)
+
+    except Exception as e:
+        print("ERROR:", e)
+        jobs.put(job_id, {"status": "error"})
+        return
+
+    key = clip_key(
+        content_hash,
+        clip_count=clip_count, clip_length=clip_length, quality=quality, shape=shape,
+        analysis=analysis
+    )
+    names = load_manifest(CLIPS_DIR, key)
+
+    if names:
+        jobs.put(job_id, clips_result(names))
+        return
+
+    jobs.update(job_id, status="queued")
+
+    # The download is already paid for, so wait for an encoder slot rather
+    # than failing the job when the encode queue is momentarily full.
+    hold_inputs(input_paths)
+    while True:
+        try:
+            encode_pool.submit(
+                job_id, process_video, input_paths, key,
+                clip_count, clip_length, quality, shape, analysis
+            )
+            return
+        except QueueFull as e:
+            time.sleep(e.retry_after)
+
+last_prune = 0.0
+
+def maybe_prune_uploads():
+    global last_prune
+    if time.monotonic() - last_prune > 600:
+        last_prune = time.monotonic()
+        with pending_lock:
+            keep = set(pending_inputs)
+        prune_uploads(UPLOADS_DIR, UPLOAD_TTL, keep)
+        prune_uploads(FEATURES_DIR, FEATURES_TTL)
 
 # =======================
 # API
 # =======================
 BASE_URL = os.environ.get("BASE_URL", "").rstrip("/")
 
+# Form validation for the profile names in profiles.py
+QUALITY_PATTERN = f"^({'|'.join(map(re.escape, QUALITIES))})$"
+SHAPE_PATTERN = f"^({'|'.join(map(re.escape, SHAPES))})$"
+
+def queue_full(retry_after):
+    return HTTPException(
+        status_code=429,
+        detail="Server is busy, please retry later",
+        headers={"Retry-After": str(retry_after)}
+    )
+
 @app.post("/process")
-async def process(video: UploadFile = File(...)):
+async def process(
+    video: UploadFile = File(...),
+    clip_count: int = Form(3, ge=1, le=10),
+    clip_length: float = Form(8, gt=0, le=60),
+    quality: str = Form(DEFAULT_QUALITY, pattern=QUALITY_PATTERN),
+    shape: str = Form(DEFAULT_SHAPE, pattern=SHAPE_PATTERN),
+    analysis: str = Form("full", pattern="^(full|coarse)$")
+):
+    # Reject before reading the upload if the queue is already full
+    if not encode_pool.has_capacity():
+        raise queue_full(encode_pool.retry_after())
+
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {"status": "starting"}
+    jobs.put(job_id, {"status": "starting"})
 
-    input_path = os.path.join(UPLOADS_DIR, f"{job_id}.mp4")
+    try:
+        input_path, content_hash = await save_upload(video, UPLOADS_DIR, f"{job_id}.part")
+    except BaseException:
+        # Client gone mid-upload: nobody will ever look at this job
+        jobs.delete(job_id)
+        raise
 
-    with open(input_path, "wb") as f:
-        while chunk := await video.read(1024 * 1024):
-            f.write(chunk)
+    # Same video, same settings: hand back the clips rendered last time
+    key = clip_key(
+        content_hash,
+        clip_count=clip_count, clip_length=clip_length, quality=quality, shape=shape,
+        analysis=analysis
+    )
+    names = load_manifest(CLIPS_DIR, key)
 
-    threading.Thread(
-        target=process_video,
-        args=(job_id, input_path),
-        daemon=True
-    ).start()
+    if names:
+        jobs.put(job_id, clips_result(names))
+    else:
+        jobs.update(job_id, status="queued")
+        hold_inputs([input_path])
+
+        try:
+            encode_pool.submit(
+                job_id, process_video, [input_path], key,
+                clip_count, clip_length, quality, shape, analysis
+            )
+        except QueueFull as e:
+            # The queue filled up while the upload was streaming in
+            release_inputs([input_path])
+            jobs.delete(job_id)
+            raise queue_full(e.retry_after)
 
     return RedirectResponse(
         url=f"https://aipeakclips.netlify.app/result.html?job={job_id}",
         status_code=303
     )
 
+@app.post("/process-url")
+def process_url(
+    url: str = Form(...),
+    clip_count: int = Form(3, ge=1, le=10),
+    clip_length: float = Form(8, gt=0, le=60),
+    mode: str = Form("full", pattern="^(full|sections)$"),
+    quality: str = Form(DEFAULT_QUALITY, pattern=QUALITY_PATTERN),
+    shape: str = Form(DEFAULT_SHAPE, pattern=SHAPE_PATTERN),
+    analysis: str = Form("full", pattern="^(full|coarse)$")
+):
+    job_id = str(uuid.uuid4())
+    jobs.put(job_id, {"status": "queued"})
+
+    try:
+        download_pool.submit(
+            job_id, download_and_process, url.strip(),
+            clip_count, clip_length, mode, quality, shape, analysis
+        )
+    except QueueFull as e:
+        jobs.delete(job_id)
+        raise queue_full(e.retry_after)
+
+    return RedirectResponse(
+        url=f"https://aipeakclips.netlify.app/result.html?job={job_id}",
+        status_code=303
+    )
+
+def job_status(job_id):
+    job = jobs.get(job_id) or {"status": "not_found"}
+
+    # Queues live in the process that accepted the job: with
+    # `uvicorn --workers N` a request answered by another worker sees the
+    # job's status but no queue_position.
+    if job["status"] == "queued":
+        position = encode_pool.position(job_id) or download_pool.position(job_id)
+        if position:
+            return {**job, "queue_position": position}
+
+    return job
+
 @app.get("/status/{job_id}")
 def status(job_id: str):
-    return jobs.get(job_id, {"status": "not_found"})
+    return job_status(job_id)
 
-@app.get("/stream/{file_name}")
-def stream(file_name: str):
-    path = os.path.join(CLIPS_DIR, file_name)
-    if not os.path.exists(path):
+# How often /events checks the job store, and how long it may stay silent
+EVENTS_INTERVAL = 0.25
+EVENTS_KEEPALIVE = 15
+
+@app.get("/events/{job_id}")
+async def events(job_id: str):
+    """
+    Server-Sent Events stream of a job's status.
+
+    A `status` event carrying the same JSON as /status/{job_id} is sent
+    whenever the job changes; the stream ends once the job is finished.
+    """
+    async def event_stream():
+        last = None
+        silent = 0.0
+
+        while True:
+            # The job store may read SQLite; keep that off the event loop
+            data = await run_in_threadpool(job_status, job_id)
+            payload = json.dumps(data)
+
+            if payload != last:
+                last = payload
+                silent = 0.0
+                yield f"event: status\ndata: {payload}\n\n"
+
+                if data["status"] in ("done", "error", "not_found"):
+                    return
+            elif silent >= EVENTS_KEEPALIVE:
+                # Comment line, keeps proxies from closing an idle stream
+                silent = 0.0
+                yield ": keep-alive\n\n"
+
+            await asyncio.sleep(EVENTS_INTERVAL)
+            silent += EVENTS_INTERVAL
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+# Clip names embed the id they were rendered for and are never rewritten,
+# so their content can be cached forever.
+CLIP_NAME = re.compile(r"^[0-9a-f-]{32,64}_(clip|preview)\d+\.mp4$")
+
+@app.api_route("/stream/{file_name}", methods=["GET", "HEAD"])
+def stream(file_name: str, request: Request):
+    path = os.path.join(CLIPS_DIR, os.path.basename(file_name))
+    if not os.path.isfile(path):
         raise HTTPException(status_code=404)
-    return FileResponse(path, media_type="video/mp4")
+
+    return MediaFileResponse(
+        path,
+        request.headers,
+        media_type="video/mp4",
+        immutable=bool(CLIP_NAME.match(file_name)),
+        head=request.method == "HEAD"
+    )
 
 # =======================
 # RUN
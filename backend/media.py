@@ -0,0 +1,200 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+
+import anyio
+from starlette.responses import Response
+
+# Bytes per read when the server cannot send the file zero-copy
+CHUNK_SIZE = 256 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+# =======================
+# HEADER HELPERS
+# =======================
+def file_etag(st):
+    """Strong ETag built from the file's identity: inode, size and mtime."""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def parse_range(header, size):
+    """
+    Parses a single-range `Range` header.
+
+    Returns:
+    tuple[int, int] | None: Inclusive (first, last) byte positions, or None
+    if the header should be ignored and the whole file served
+
+    Raises:
+    RangeNotSatisfiable: For multiple ranges or a range outside the file
+    """
+    if not header:
+        return None
+
+    if "," in header:
+        raise RangeNotSatisfiable()
+
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        # Unknown units or malformed syntax: ignore the header (RFC 9110)
+        return None
+
+    first, last = match.groups()
+
+    if first == "":
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+
+    first = int(first)
+    last = int(last) if last else size - 1
+
+    if first >= size or last < first:
+        raise RangeNotSatisfiable()
+
+    return first, min(last, size - 1)
+
+
+def _etag_matches(header, etag):
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def _not_modified_since(header, mtime):
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+# =======================
+# RESPONSE
+# =======================
+class MediaFileResponse(Response):
+    """
+    File response for `<video>` playback and CDN caching.
+
+    Handles single byte ranges (206 / 416), strong ETags, If-None-Match,
+    If-Modified-Since and If-Range, and sends the body with the server's
+    zero-copy `http.response.zerocopysend` extension (sendfile) when it is
+    available, falling back to chunked reads in a worker thread. uvicorn
+    does not offer that extension, so under the project's own server the
+    chunked path is the one that runs.
+
+    Parameters:
+    path (str): File to serve
+    request_headers (Headers): Headers of the incoming request
+    media_type (str): Content-Type of the file
+    immutable (bool): Whether the file name is content-addressed, so
+    clients and CDNs may cache it forever
+    head (bool): Send headers only
+    """
+
+    def __init__(self, path, request_headers, media_type, immutable=False, head=False):
+        self.path = path
+        self.head = head
+        self.offset = 0
+
+        st = os.stat(path)
+        etag = file_etag(st)
+
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+            "cache-control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+        }
+
+        super().__init__(media_type=media_type, headers=headers)
+
+        # Conditional GET: If-None-Match wins over If-Modified-Since
+        if_none_match = request_headers.get("if-none-match")
+        if_modified_since = request_headers.get("if-modified-since")
+
+        if (if_none_match and _etag_matches(if_none_match, etag)) or (
+            not if_none_match and if_modified_since and _not_modified_since(if_modified_since, st.st_mtime)
+        ):
+            self.status_code = 304
+            self.count = 0
+            for name in ("content-type", "content-length"):
+                if name in self.headers:
+                    del self.headers[name]
+            return
+
+        # If-Range: only honour Range when the client's copy is current
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if if_range and if_range.strip() != etag:
+            range_header = None
+
+        try:
+            byte_range = parse_range(range_header, st.st_size)
+        except RangeNotSatisfiable:
+            self.status_code = 416
+            self.count = 0
+            self.headers["content-range"] = f"bytes */{st.st_size}"
+            self.headers["content-length"] = "0"
+            return
+
+        if byte_range is None:
+            self.count = st.st_size
+        else:
+            first, last = byte_range
+            self.status_code = 206
+            self.offset = first
+            self.count = last - first + 1
+            self.headers["content-range"] = f"bytes {first}-{last}/{st.st_size}"
+
+        self.headers["content-length"] = str(self.count)
+
+    async def __call__(self, scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+
+        if self.head or self.count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({
+                    "type": "http.response.zerocopysend",
+                    # The ASGI extension takes the open file object itself
+                    "file": f,
+                    "offset": self.offset,
+                    "count": self.count,
+                })
+                return
+
+            await anyio.to_thread.run_sync(f.seek, self.offset)
+            remaining = self.count
+
+            while remaining:
+                chunk = await anyio.to_thread.run_sync(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": remaining > 0,
+                })
+
+            if remaining:
+                # File shrank underneath us; close the response cleanly
+                await send({"type": "http.response.body", "body": b""})
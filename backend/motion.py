@@ -0,0 +1,97 @@
+# =======================
+# IMPORTS
+# =======================
+import numpy as np
+
+# =======================
+# SETTINGS
+# =======================
+# ffmpeg shrinks and decimates frames before they reach Python, so only
+# ANALYSIS_FPS tiny gray frames per second of video are ever handled here.
+ANALYSIS_FPS = 4
+FRAME_W = 128
+FRAME_H = 72
+
+# Frames processed per NumPy batch
+BATCH_FRAMES = 512
+
+# Histogram buckets used for scene-change detection
+HIST_BINS = 16
+
+
+# =======================
+# FRAME STREAMING
+# =======================
+# Decoder shortcuts (input options): deblocking and non-reference frames
+# make no visible difference once frames are shrunk to FRAME_W x FRAME_H
+FAST_DECODE = ["-skip_loop_filter", "all", "-skip_frame", "noref"]
+
+# Output options turning any video track into the frames read_changes expects
+FRAMES_OUTPUT = [
+    "-vf", f"fps={ANALYSIS_FPS},scale={FRAME_W}:{FRAME_H}:flags=fast_bilinear,format=gray",
+    "-f", "rawvideo",
+]
+
+
+def frame_changes(frames, previous=None):
+    """
+    Scores how much each frame differs from the one before it.
+
+    Parameters:
+    frames (np.ndarray): uint8 array of shape (n, FRAME_H, FRAME_W)
+    previous (np.ndarray | None): Last frame of the previous batch
+
+    Returns:
+    tuple[np.ndarray, np.ndarray]: Per-frame motion (mean absolute pixel
+    difference, 0..1) and histogram change (half the L1 distance between
+    normalised histograms, 0..1, close to 1 on a hard cut)
+    """
+    n = len(frames)
+    if previous is None:
+        previous = frames[0]
+    stacked = np.concatenate((previous[None], frames))
+
+    diff = np.abs(stacked[1:].astype(np.int16) - stacked[:-1])
+    motion = diff.reshape(n, -1).mean(axis=1) / 255.0
+
+    # One bincount for the whole batch: offset each frame's bins by its index
+    buckets = (stacked // (256 // HIST_BINS)).reshape(n + 1, -1).astype(np.int64)
+    buckets += (np.arange(n + 1) * HIST_BINS)[:, None]
+    hist = np.bincount(buckets.ravel(), minlength=(n + 1) * HIST_BINS)
+    hist = hist.reshape(n + 1, HIST_BINS) / float(FRAME_W * FRAME_H)
+    cuts = 0.5 * np.abs(hist[1:] - hist[:-1]).sum(axis=1)
+
+    return motion.astype(np.float32), cuts.astype(np.float32)
+
+
+def read_changes(stream):
+    """
+    Scores a stream of raw FRAME_W x FRAME_H gray frames, one batch of
+    BATCH_FRAMES at a time.
+
+    Returns:
+    tuple[np.ndarray, np.ndarray]: Motion and scene-change scores, one value
+    per frame
+    """
+    frame_bytes = FRAME_W * FRAME_H
+
+    motion, cuts = [], []
+    previous = None
+
+    while True:
+        data = stream.read(frame_bytes * BATCH_FRAMES)
+        usable = len(data) - len(data) % frame_bytes
+        if not usable:
+            break
+
+        frames = np.frombuffer(data[:usable], dtype=np.uint8).reshape(-1, FRAME_H, FRAME_W)
+        m, c = frame_changes(frames, previous)
+        motion.append(m)
+        cuts.append(c)
+        previous = frames[-1]
+
+    if not motion:
+        empty = np.zeros(0, dtype=np.float32)
+        return empty, empty
+
+    return np.concatenate(motion), np.concatenate(cuts)
@@ -0,0 +1,234 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+
+import numpy as np
+
+from audio_peaks import HOP
+from selection import select_windows
+from analysis import FEATURES, analyse
+
+# How much each feature counts towards a window's score. Loudness and motion
+# weigh the same; a hard scene cut counts half as much as continuous motion.
+DEFAULT_WEIGHTS = {"loudness": 1.0, "motion": 1.0, "cuts": 0.5}
+
+
+def weights_from_env():
+    """
+    Reads PEAK_WEIGHTS, e.g. "loudness=1,motion=2,cuts=0"; features it does
+    not mention keep their default weight.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+
+    for part in os.environ.get("PEAK_WEIGHTS", "").split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip() in FEATURES.names:
+            weights[name.strip()] = float(value)
+
+    return weights
+
+
+WEIGHTS = weights_from_env()
+
+# Coarse-to-fine analysis: the keyframe scan proposes this many regions per
+# clip wanted, each padded by REGION_MARGIN seconds on both sides, and only
+# those regions are decoded in full
+REGIONS_PER_CLIP = 3
+REGION_MARGIN = 5.0
+
+# Clip boundaries move by at most this many seconds to land on a shot
+# change or a pause
+SNAP_DISTANCE = 1.0
+
+# Histogram change that counts as a shot change
+CUT_THRESHOLD = 0.35
+
+# Hops this quiet (share of the quietest hops in the video) count as pauses
+QUIET_PERCENTILE = 20
+
+
+def _normalise(curve):
+    """Rescales a curve to zero mean and unit variance."""
+    std = curve.std()
+    if std < 1e-9:
+        return np.zeros_like(curve)
+    return (curve - curve.mean()) / std
+
+
+# =======================
+# FUSION
+# =======================
+def fuse(features, weights=None):
+    """
+    Combines the feature columns into one interest score per row.
+
+    Every column is normalised first, so the weights compare features on
+    the same scale; a constant column (e.g. loudness of a silent video)
+    contributes nothing.
+
+    Parameters:
+    features (np.ndarray): FEATURES array from analysis.analyse
+    weights (dict | None): Weight per feature name (default: WEIGHTS)
+
+    Returns:
+    np.ndarray: float64 score per row
+    """
+    weights = weights or WEIGHTS
+    score = np.zeros(len(features))
+
+    for name, weight in weights.items():
+        if weight:
+            score += weight * _normalise(features[name].astype(np.float64))
+
+    return score
+
+
+# =======================
+# CLIP SELECTION
+# =======================
+def rank_windows(features, clip_length, k, weights=None, valid=None):
+    """
+    Picks the `k` best-scoring non-overlapping windows of `clip_length`
+    seconds from a feature array.
+
+    Parameters:
+    valid (np.ndarray | None): Boolean mask of the rows that were actually
+    analysed; only those are scored, and windows stay inside them
+
+    Returns:
+    list[tuple[float, float]]: (start seconds, score), best first
+    """
+    window = max(1, int(round(clip_length / HOP)))
+
+    if valid is None:
+        score = fuse(features, weights)
+    else:
+        # Normalise over the analysed rows only
+        score = np.zeros(len(features))
+        score[valid] = fuse(features[valid], weights)
+
+    return [
+        (start * HOP, score)
+        for start, score in select_windows(score, window, k, valid)
+    ]
+
+
+# =======================
+# BOUNDARY SNAPPING
+# =======================
+def _nearest(candidates, times, max_distance):
+    """
+    For each of `times`, the closest of the sorted `candidates`, or NaN if
+    none is within `max_distance`. One searchsorted call for all times.
+    """
+    if not len(candidates):
+        return np.full(len(times), np.nan)
+
+    i = np.clip(np.searchsorted(candidates, times), 1, max(1, len(candidates) - 1))
+    before = candidates[i - 1]
+    after = candidates[np.minimum(i, len(candidates) - 1)]
+    best = np.where(times - before <= after - times, before, after)
+    return np.where(np.abs(best - times) <= max_distance, best, np.nan)
+
+
+def boundary_points(features):
+    """
+    Times (seconds) where a cut looks natural, from the analysis features.
+
+    Returns:
+    tuple[np.ndarray, np.ndarray]: Shot changes, and pauses (the quietest
+    hops of the audio; none if the loudness never varies)
+    """
+    shots = np.flatnonzero(features["cuts"] >= CUT_THRESHOLD) * HOP
+
+    loudness = features["loudness"]
+    if len(loudness) and loudness.std() > 1e-6:
+        quiet = loudness <= np.percentile(loudness, QUIET_PERCENTILE)
+        # When most hops share one level the percentile is that level;
+        # a pause must still be quieter than the typical hop
+        quiet &= loudness < np.median(loudness)
+        # A pause's midpoint is the best place to cut within it
+        pauses = np.flatnonzero(quiet) * HOP + HOP / 2
+    else:
+        pauses = np.zeros(0)
+
+    return shots, pauses
+
+
+def snap_windows(features, windows, max_distance=SNAP_DISTANCE):
+    """
+    Moves clip boundaries onto nearby shot changes, or failing that onto
+    nearby pauses, so clips neither start mid-shot nor end mid-word.
+
+    Each boundary moves independently by at most `max_distance` seconds;
+    boundaries with nothing nearby stay where they were.
+
+    Parameters:
+    features (np.ndarray): FEATURES array from analysis.analyse
+    windows (list[tuple[float, float]]): (start, length) per clip
+
+    Returns:
+    list[tuple[float, float]]: Refined (start, length) per clip
+    """
+    if not windows:
+        return []
+
+    shots, pauses = boundary_points(features)
+    total = len(features) * HOP
+
+    starts = np.array([start for start, _ in windows], dtype=np.float64)
+    ends = starts + np.array([length for _, length in windows], dtype=np.float64)
+
+    def snap(times):
+        snapped = _nearest(shots, times, max_distance)
+        snapped = np.where(np.isnan(snapped), _nearest(pauses, times, max_distance), snapped)
+        return np.where(np.isnan(snapped), times, snapped)
+
+    new_starts = np.clip(snap(starts), 0.0, total)
+    new_ends = np.clip(snap(ends), 0.0, total)
+
+    # Never let snapping collapse a clip; keep the original window instead
+    keep = new_ends - new_starts < 0.5 * (ends - starts)
+    new_starts = np.where(keep, starts, new_starts)
+    new_ends = np.where(keep, ends, new_ends)
+
+    return [(float(a), float(b - a)) for a, b in zip(new_starts, new_ends)]
+
+
+# =======================
+# COARSE-TO-FINE ANALYSIS
+# =======================
+def refine_regions(input_video, coarse, clip_length, k):
+    """
+    Re-analyses the most promising regions of a keyframe-only scan at the
+    full analysis rate.
+
+    Parameters:
+    coarse (np.ndarray): FEATURES array from analyse(keyframes_only=True)
+
+    Returns:
+    tuple[np.ndarray, np.ndarray, int] | None: Features with the regions
+    filled in, the mask of refined rows (for rank_windows) and the frames
+    decoded; None if the regions would cover most of the video anyway
+    """
+    region_length = clip_length + 2 * REGION_MARGIN
+    regions = rank_windows(coarse, region_length, k * REGIONS_PER_CLIP)
+
+    if not regions or len(regions) * region_length >= 0.5 * len(coarse) * HOP:
+        return None
+
+    features = np.array(coarse)
+    valid = np.zeros(len(features), dtype=bool)
+    decoded = 0
+
+    for start, _ in regions:
+        fine, frames = analyse(input_video, start, region_length)
+        decoded += frames
+
+        first = int(round(start / HOP))
+        fine = fine[:len(features) - first]
+        features[first:first + len(fine)] = fine
+        valid[first:first + len(fine)] = True
+
+    return features, valid, decoded
@@ -0,0 +1,89 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import json
+import subprocess
+from functools import lru_cache
+
+import numpy as np
+
+
+# =======================
+# FFPROBE
+# =======================
+@lru_cache(maxsize=256)
+def _probe(path, mtime, size):
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if result.returncode != 0:
+        print(result.stderr.decode())
+        raise Exception("FFprobe failed")
+
+    return json.loads(result.stdout)
+
+
+def probe(path):
+    """
+    Returns ffprobe's JSON description (format + streams) of a media file.
+
+    Results are cached per file; the cache key includes the modification
+    time and size, so a file rewritten in place is probed again. The
+    returned dict is shared between callers and must not be modified.
+    """
+    st = os.stat(path)
+    return _probe(path, st.st_mtime_ns, st.st_size)
+
+
+def duration(path):
+    """Length of the media file in seconds."""
+    return float(probe(path)["format"]["duration"])
+
+
+def has_audio(path):
+    return any(s["codec_type"] == "audio" for s in probe(path)["streams"])
+
+
+def video_stream(path):
+    """The first video stream's ffprobe entry, or None."""
+    for s in probe(path)["streams"]:
+        if s["codec_type"] == "video":
+            return s
+    return None
+
+
+@lru_cache(maxsize=64)
+def _keyframes(path, mtime, size):
+    # Packet flags come straight from the container index: nothing is decoded
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=print_section=0",
+        path
+    ]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    if result.returncode != 0:
+        print(result.stderr.decode())
+        raise Exception("FFprobe failed")
+
+    times = []
+    for line in result.stdout.decode().splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            times.append(float(pts))
+
+    return np.unique(np.array(times, dtype=np.float64))
+
+
+def keyframes(path):
+    """Sorted keyframe timestamps (seconds) of the first video stream."""
+    st = os.stat(path)
+    return _keyframes(path, st.st_mtime_ns, st.st_size)
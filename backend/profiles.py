@@ -0,0 +1,65 @@
+# =======================
+# ENCODING PROFILES
+# =======================
+# Speed/quality tiers. `scale` shrinks the output frame (draft previews are
+# rendered at half size), `fps` caps the frame rate (None keeps the source's).
+QUALITIES = {
+    "draft": {"preset": "ultrafast", "crf": 32, "scale": 0.5, "fps": 15, "audio_bitrate": "64k"},
+    "standard": {"preset": "veryfast", "crf": 28, "scale": 1.0, "fps": None, "audio_bitrate": "128k"},
+    "archival": {"preset": "slow", "crf": 20, "scale": 1.0, "fps": None, "audio_bitrate": "192k"},
+}
+
+# Output frame shapes at full size
+SHAPES = {
+    "9:16": (720, 1280),
+    "1:1": (720, 720),
+    "16:9": (1280, 720),
+}
+
+DEFAULT_QUALITY = "standard"
+DEFAULT_SHAPE = "9:16"
+
+
+def _even(n):
+    # libx264 with yuv420p needs even dimensions
+    return max(2, int(n) // 2 * 2)
+
+
+def get_profile(quality=DEFAULT_QUALITY, shape=DEFAULT_SHAPE):
+    """
+    Builds the ffmpeg settings for one quality tier and frame shape.
+
+    Returns:
+    dict: "width"/"height" of the output, the "filter" fitting any source
+    into that frame (letterboxed, nothing cropped), the "encode_args"
+    for the output file and the "audio_args" alone (for clips whose video
+    is stream-copied)
+
+    Raises:
+    KeyError: For an unknown quality or shape
+    """
+    q = QUALITIES[quality]
+    full_w, full_h = SHAPES[shape]
+    w, h = _even(full_w * q["scale"]), _even(full_h * q["scale"])
+
+    vf = f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"
+    if q["fps"]:
+        vf = f"fps={q['fps']},{vf}"
+
+    audio_args = ["-c:a", "aac", "-b:a", q["audio_bitrate"]]
+
+    return {
+        "name": f"{quality}/{shape}",
+        "width": w,
+        "height": h,
+        "filter": vf,
+        "encode_args": [
+            "-c:v", "libx264",
+            "-preset", q["preset"],
+            "-crf", str(q["crf"]),
+            "-pix_fmt", "yuv420p",
+            *audio_args,
+            "-movflags", "+faststart",
+        ],
+        "audio_args": audio_args,
+    }
@@ -0,0 +1,110 @@
+# =======================
+# IMPORTS
+# =======================
+import threading
+import subprocess
+from collections import deque
+
+# Lines of ffmpeg's log kept for error reports
+STDERR_TAIL = 40
+
+
+# =======================
+# PARSING
+# =======================
+def _number(value, suffix=""):
+    # ffmpeg writes "N/A" until it has a value
+    try:
+        return float(value.strip().removesuffix(suffix))
+    except ValueError:
+        return None
+
+
+def parse_progress(lines):
+    """
+    Turns ffmpeg's `-progress` key=value stream into one dict per report.
+
+    Yields:
+    dict: {"time": output seconds, "speed": x realtime, "fps": frames/s,
+    "final": True on the last report}; values may be None while unknown
+    """
+    block = {}
+
+    for line in lines:
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            continue
+
+        if key != "progress":
+            block[key] = value
+            continue
+
+        out_us = _number(block.get("out_time_us", "N/A"))
+        yield {
+            "time": out_us / 1e6 if out_us is not None and out_us >= 0 else None,
+            "speed": _number(block.get("speed", "N/A"), "x"),
+            "fps": _number(block.get("fps", "N/A")),
+            "final": value == "end",
+        }
+        block = {}
+
+
+def summarise(processed, total, stats):
+    """
+    Builds the progress record stored on a job.
+
+    Parameters:
+    processed (float): Seconds of output rendered so far
+    total (float): Seconds of output the job will render
+    stats (dict): Report from parse_progress
+    """
+    speed = stats["speed"]
+    remaining = max(0.0, total - processed)
+
+    return {
+        "percent": round(min(100.0, 100.0 * processed / total), 1) if total else None,
+        "processed": round(processed, 2),
+        "speed": speed,
+        "fps": stats["fps"],
+        "eta": round(remaining / speed, 1) if speed else None,
+    }
+
+
+# =======================
+# RUNNING
+# =======================
+def run_with_progress(cmd, on_progress=None):
+    """
+    Runs an ffmpeg command, calling `on_progress` with each parsed report.
+
+    Progress is read line by line from `-progress pipe:1`; the human log on
+    stderr is drained concurrently and only its last lines are kept, so
+    memory use stays constant however long the encode runs.
+
+    Raises:
+    Exception: If ffmpeg exits with an error
+    """
+    cmd = [cmd[0], "-nostats", "-progress", "pipe:1", *cmd[1:]]
+
+    proc = subprocess.Popen(
+        cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace"
+    )
+
+    tail = deque(maxlen=STDERR_TAIL)
+    drain = threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True)
+    drain.start()
+
+    for stats in parse_progress(proc.stdout):
+        if on_progress and stats["time"] is not None:
+            on_progress(stats)
+
+    returncode = proc.wait()
+    drain.join()
+
+    if returncode != 0:
+        print("".join(tail))
+        raise Exception("FFmpeg failed")
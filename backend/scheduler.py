@@ -0,0 +1,180 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import time
+import threading
+from collections import deque
+
+
+def _usable_cpus():
+    # Honours CPU affinity masks (taskset, container cpusets) where supported
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+class QueueFull(Exception):
+    """
+    Raised by JobScheduler.submit when the waiting queue is at its depth limit.
+
+    Attributes:
+    retry_after (int): Suggested number of seconds before the client retries
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("job queue is full")
+        self.retry_after = retry_after
+
+
+# =======================
+# JOB SCHEDULER
+# =======================
+class JobScheduler:
+    """
+    Fixed pool of worker threads draining a FIFO queue of jobs.
+
+    Every job runs `fn(job_id, *args)` on one of `workers` threads, so at most
+    `workers` jobs execute at the same time no matter how many are submitted.
+    Once `max_queue` jobs are waiting, submit() raises QueueFull instead of
+    letting the backlog grow without bound.
+
+    Parameters:
+    workers (int | None): Number of worker slots (defaults to the CPUs this
+    process may run on)
+    max_queue (int): Maximum number of jobs waiting for a free slot
+    name (str): Prefix for the worker thread names
+    on_start (callable | None): Called once in every worker thread before it
+    takes its first job, e.g. to lower the thread's priority
+    """
+
+    def __init__(self, workers=None, max_queue=100, name="worker", on_start=None):
+        self.workers = max(1, workers or _usable_cpus())
+        self.max_queue = max_queue
+        self.name = name
+        self.on_start = on_start
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._running = set()
+        self._threads = []
+
+        # Every submitted job gets a ticket; its queue position is simply
+        # how far its ticket is ahead of the number of jobs already dispatched.
+        self._tickets = {}
+        self._submitted = 0
+        self._dispatched = 0
+
+        # Moving average of job run time, used for the Retry-After estimate
+        self._avg_runtime = 30.0
+
+    # -----------------------
+    # PUBLIC API
+    # -----------------------
+    def submit(self, job_id, fn, *args):
+        """
+        Queues a job and returns its 1-based position in the queue.
+
+        Raises:
+        QueueFull: If `max_queue` jobs are already waiting
+        """
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                raise QueueFull(self.retry_after())
+
+            self._start_workers()
+            self._submitted += 1
+            self._tickets[job_id] = self._submitted
+            self._queue.append((job_id, fn, args))
+            self._cond.notify()
+
+            return self._submitted - self._dispatched
+
+    def has_capacity(self):
+        """Returns True if a new job would currently be accepted."""
+        with self._cond:
+            return len(self._queue) < self.max_queue
+
+    def position(self, job_id):
+        """
+        Returns the 1-based queue position of a waiting job, 0 if it is
+        running, or None if this scheduler does not know about it.
+        """
+        with self._cond:
+            if job_id in self._running:
+                return 0
+            ticket = self._tickets.get(job_id)
+            if ticket is None:
+                return None
+            return ticket - self._dispatched
+
+    def running_count(self):
+        with self._cond:
+            return len(self._running)
+
+    def queued_count(self):
+        with self._cond:
+            return len(self._queue)
+
+    def thread_budget(self, threads=None):
+        """
+        CPU threads one job may use so that the busy slots together do not
+        oversubscribe the machine.
+
+        Jobs already waiting count as busy too, since they will claim a slot
+        as soon as one frees up.
+
+        Parameters:
+        threads (int | None): Threads to share (defaults to the usable CPUs)
+        """
+        total = threads or _usable_cpus()
+        with self._cond:
+            busy = min(self.workers, len(self._running) + len(self._queue))
+        return max(1, total // max(1, busy))
+
+    def retry_after(self):
+        """Rough number of seconds until a queue slot frees up."""
+        # With every slot busy, one job finishes every avg_runtime / workers
+        return max(1, int(self._avg_runtime / self.workers))
+
+    # -----------------------
+    # WORKERS
+    # -----------------------
+    def _start_workers(self):
+        # Threads are started lazily so importing the module has no side effects
+        if self._threads:
+            return
+
+        for i in range(self.workers):
+            t = threading.Thread(
+                target=self._worker,
+                name=f"{self.name}-{i + 1}",
+                daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def _worker(self):
+        if self.on_start:
+            self.on_start()
+
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+
+                job_id, fn, args = self._queue.popleft()
+                self._dispatched += 1
+                self._tickets.pop(job_id, None)
+                self._running.add(job_id)
+
+            started = time.monotonic()
+            try:
+                fn(job_id, *args)
+            except Exception as e:
+                print(f"{self.name} job {job_id} crashed:", e)
+            finally:
+                elapsed = time.monotonic() - started
+                with self._cond:
+                    self._running.discard(job_id)
+                    self._avg_runtime = 0.8 * self._avg_runtime + 0.2 * elapsed
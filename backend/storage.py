@@ -0,0 +1,160 @@
+# =======================
+# IMPORTS
+# =======================
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_CHUNK = 1024 * 1024
+
+
+# =======================
+# CONTENT-ADDRESSED UPLOADS
+# =======================
+def _write_chunk(f, digest, chunk):
+    # Runs in a worker thread: both calls release the GIL on large buffers
+    digest.update(chunk)
+    f.write(chunk)
+
+
+async def save_upload(upload, folder, tmp_name):
+    """
+    Streams an UploadFile to disk while hashing it, and files it under its
+    SHA-256.
+
+    Disk writes and hashing run in the threadpool, so a slow disk never
+    stalls the event loop. The data lands in `tmp_name` first and is then
+    renamed to `<sha256>.mp4`; identical uploads therefore share one file.
+
+    Returns:
+    tuple[str, str]: (stored path, hex SHA-256 of the content)
+    """
+    digest = hashlib.sha256()
+    tmp_path = os.path.join(folder, tmp_name)
+
+    try:
+        f = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while chunk := await upload.read(UPLOAD_CHUNK):
+                await run_in_threadpool(_write_chunk, f, digest, chunk)
+        finally:
+            await run_in_threadpool(f.close)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    content_hash = digest.hexdigest()
+    path = os.path.join(folder, f"{content_hash}.mp4")
+    os.replace(tmp_path, path)
+
+    return path, content_hash
+
+
+def content_hash_of(path):
+    """The SHA-256 a stored upload is filed under (see save_upload)."""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def prune_uploads(folder, max_age, keep=()):
+    """
+    Deletes stored files that no job has used for `max_age` seconds; used
+    for uploads and feature indexes alike.
+
+    Parameters:
+    keep (collection[str]): Paths that stay regardless of age, e.g. the
+    inputs of jobs still waiting in the queue
+    """
+    cutoff = time.time() - max_age
+
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.path in keep:
+                continue
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+
+# =======================
+# CLIP RESULTS
+# =======================
+def clip_key(content_hash, **params):
+    """
+    Identifies one rendering of one source: the same content rendered with
+    the same parameters always gets the same key, and so the same clips.
+    """
+    spec = ":".join(f"{k}={params[k]}" for k in sorted(params))
+    return hashlib.sha256(f"{content_hash}:{spec}".encode()).hexdigest()[:32]
+
+
+def load_manifest(folder, key):
+    """
+    Returns the clip file names rendered for `key`, or None if they are
+    missing or incomplete.
+    """
+    try:
+        with open(os.path.join(folder, f"{key}.json")) as f:
+            names = json.load(f)["clips"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+    if not all(os.path.isfile(os.path.join(folder, name)) for name in names):
+        return None
+
+    return names
+
+
+def save_manifest(folder, key, names):
+    """Records the finished clips for `key` (written atomically)."""
+    path = os.path.join(folder, f"{key}.json")
+
+    # A private temp file per call: jobs on every thread share one PID
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{key}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"clips": names}, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+# =======================
+# FEATURE INDEX
+# =======================
+def load_features(folder, name):
+    """
+    Returns the analysis features saved under `name`, memory-mapped
+    read-only, or None if there are none.
+    """
+    path = os.path.join(folder, f"{name}.npy")
+    try:
+        features = np.load(path, mmap_mode="r")
+    except (FileNotFoundError, ValueError):
+        return None
+
+    # Counts as a fresh use for prune_uploads
+    os.utime(path)
+    return features
+
+
+def save_features(folder, name, features):
+    """Saves an analysis feature array under `name` (written atomically)."""
+    path = os.path.join(folder, f"{name}.npy")
+
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, features)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
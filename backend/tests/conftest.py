@@ -0,0 +1,59 @@
+# =======================
+# SHARED FIXTURES
+# =======================
+import os
+import sys
+import shutil
+import subprocess
+
+import pytest
+
+# The backend is a flat set of modules run from backend/ (see the Dockerfile)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Importing main must not open the real job database
+os.environ.setdefault("JOB_STORE", "memory")
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+# Synthetic source: every frame is flat gray with brightness FRAME_STEP * N
+# (mod 256), so a frame's brightness tells which source frame it is
+FPS = 25
+FRAME_STEP = 8
+GOP = 250
+
+
+@pytest.fixture(scope="session")
+def counter_video(tmp_path_factory):
+    """120 s, 64x64 H.264 source with a keyframe every GOP frames."""
+    path = str(tmp_path_factory.mktemp("media") / "counter.mp4")
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi",
+            "-i", f"nullsrc=s=64x64:r={FPS}:d=120,geq=lum='mod(N*{FRAME_STEP},256)':cb=128:cr=128",
+            "-c:v", "libx264", "-g", str(GOP), "-keyint_min", str(GOP), "-sc_threshold", "0",
+            "-qp", "0", "-pix_fmt", "yuv420p",
+            path
+        ],
+        check=True
+    )
+    return path
+
+
+@pytest.fixture(scope="session")
+def av_video(tmp_path_factory):
+    """40 s, 64x64 H.264 + AAC source with moving video and a tone."""
+    path = str(tmp_path_factory.mktemp("media") / "av.mp4")
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=s=64x64:r={FPS}:d=40",
+            "-f", "lavfi", "-i", "sine=d=40",
+            "-c:v", "libx264", "-pix_fmt", "yuv420p", "-c:a", "aac",
+            path
+        ],
+        check=True
+    )
+    return path
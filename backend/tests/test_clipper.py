@@ -0,0 +1,103 @@
+import re
+import subprocess
+
+import numpy as np
+import pytest
+
+from clipper import SEEK_MARGIN, build_clip_cmd, can_stream_copy, render_clips
+from conftest import FPS, GOP, requires_ffmpeg
+from probe import probe
+from profiles import get_profile
+
+pytestmark = requires_ffmpeg
+
+DECODED_RE = re.compile(r"Input stream #0:0 \(video\):.*?(\d+) frames decoded")
+
+
+def render(source, output, start, length):
+    """Renders one clip; returns the number of source frames ffmpeg decoded."""
+    cmd = build_clip_cmd(source, output, start, length)
+    cmd = [cmd[0], "-v", "verbose", *cmd[1:]]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return int(DECODED_RE.search(result.stderr).group(1))
+
+
+def center_levels(path):
+    """Brightness of the center pixel of every frame of a clip."""
+    raw = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-vf", "crop=2:2", "-f", "rawvideo",
+         "-pix_fmt", "gray", "pipe:1"],
+        capture_output=True, check=True
+    ).stdout
+    return np.frombuffer(raw, dtype=np.uint8).reshape(-1, 4)[:, 0].astype(int)
+
+
+@pytest.fixture(scope="module")
+def source_levels(counter_video):
+    return center_levels(counter_video)
+
+
+@pytest.mark.parametrize("start", [3.0, 47.48, 101.2])
+def test_clip_starts_on_the_requested_frame(counter_video, source_levels, tmp_path, start):
+    output = str(tmp_path / "clip.mp4")
+    render(counter_video, output, start, 2.0)
+
+    levels = center_levels(output)
+    assert len(levels) == 2 * FPS
+
+    # The first frame is the source frame at `start`, not a nearby keyframe
+    # (neighbouring frames differ by about FRAME_STEP levels)
+    first = round(start * FPS)
+    assert abs(levels[0] - source_levels[first]) <= 2
+    assert abs(levels[-1] - source_levels[first + len(levels) - 1]) <= 2
+
+
+def test_decode_cost_does_not_grow_with_the_offset(counter_video, tmp_path):
+    near = render(counter_video, str(tmp_path / "near.mp4"), 3.0, 2.0)
+    far = render(counter_video, str(tmp_path / "far.mp4"), 101.2, 2.0)
+
+    # At most the seek margin, one GOP and the clip itself are decoded,
+    # wherever the clip starts
+    bound = (SEEK_MARGIN + 2.0) * FPS + GOP
+    assert near <= bound
+    assert far <= bound
+
+
+def test_stream_copy_encodes_non_aac_audio(tmp_path):
+    # H.264 video that can be copied as is, next to PCM audio that MP4
+    # players do not accept
+    source = str(tmp_path / "pcm.mov")
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", f"testsrc=s=64x64:r={FPS}:d=10",
+            "-f", "lavfi", "-i", "sine=d=10",
+            "-c:v", "libx264", "-g", str(FPS), "-pix_fmt", "yuv420p",
+            "-c:a", "pcm_s16le",
+            source
+        ],
+        check=True
+    )
+    profile = {**get_profile(), "width": 64, "height": 64}
+    assert can_stream_copy(source, profile)
+
+    output = str(tmp_path / "clip.mp4")
+    render_clips(source, [(2.0, 3.0, output)], profile=profile)
+
+    codecs = {s["codec_type"]: s["codec_name"] for s in probe(output)["streams"]}
+    assert codecs == {"video": "h264", "audio": "aac"}
+
+
+def test_grouped_draft_clips_end_on_time(av_video, tmp_path):
+    # The draft profile resamples to 15 fps; within a group the fps filter
+    # would otherwise pad every clip up to the end of the group
+    clips = [
+        (5.0, 4.0, str(tmp_path / "a.mp4")),
+        (12.0, 3.0, str(tmp_path / "b.mp4")),
+        (30.0, 4.0, str(tmp_path / "c.mp4")),
+    ]
+    render_clips(av_video, clips, profile=get_profile("draft", "9:16"))
+
+    for _, length, output in clips:
+        for stream in probe(output)["streams"]:
+            assert abs(float(stream["duration"]) - length) < 0.15, (output, stream["codec_type"])
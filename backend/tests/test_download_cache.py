@@ -0,0 +1,69 @@
+import os
+
+import download_cache
+from download_cache import DownloadCache
+
+
+def writer(data=b"video"):
+    """A fetch() that "downloads" one file, counting its calls."""
+    calls = []
+
+    def fetch(folder):
+        calls.append(folder)
+        path = os.path.join(folder, "video.mp4")
+        with open(path, "wb") as f:
+            f.write(data)
+        return [path]
+
+    return fetch, calls
+
+
+def test_get_or_fetch_downloads_once(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=1 << 20)
+    fetch, calls = writer()
+
+    first = cache.get_or_fetch("key", fetch)
+    second = cache.get_or_fetch("key", fetch)
+
+    assert first == second
+    assert len(calls) == 1
+
+
+def test_entry_evicted_during_get_is_a_miss(tmp_path, monkeypatch):
+    cache = DownloadCache(str(tmp_path), max_bytes=1 << 20)
+    cache.get_or_fetch("key", writer()[0])
+
+    # Another thread's eviction removed it between the checks and the touch
+    def utime(path, *args):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(download_cache.os, "utime", utime)
+    assert cache.get("key") is None
+
+
+def test_files_are_linked_while_eviction_is_held_off(tmp_path):
+    cache = DownloadCache(str(tmp_path / "cache"), max_bytes=1 << 20)
+    outside = tmp_path / "uploads"
+    outside.mkdir()
+    locked = []
+
+    def link(path, digest):
+        locked.append(cache._lock.locked())
+        return download_cache.link_or_copy(path, str(outside / f"{digest}.mp4"))
+
+    fetched = cache.get_or_fetch("key", writer()[0], link)
+    cached = cache.get_or_fetch("key", writer()[0], link)
+
+    assert locked == [True, True]
+    assert fetched == cached
+    assert os.path.dirname(fetched[0][0]) == str(outside)
+
+
+def test_evict_counts_the_kept_entry(tmp_path):
+    cache = DownloadCache(str(tmp_path), max_bytes=8)
+    cache.get_or_fetch("old", writer(b"12345")[0])
+    cache.get_or_fetch("new", writer(b"12345")[0])
+
+    # Even the new entry alone is over budget: it is kept, the old one goes
+    assert cache.get("new") is not None
+    assert cache.get("old") is None
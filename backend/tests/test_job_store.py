@@ -0,0 +1,141 @@
+import sys
+import json
+import time
+import threading
+import subprocess
+
+from job_store import ORPHAN_AFTER, SQLiteJobStore
+from conftest import BACKEND_DIR
+
+
+class FlushAfterRelease:
+    """
+    Stands in for a store's lock and commits the write buffer every time
+    the lock is released, i.e. between any two critical sections.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def __enter__(self):
+        self._lock.acquire()
+
+    def __exit__(self, *exc):
+        self._lock.release()
+        if not getattr(self._local, "flushing", False):
+            self._local.flushing = True
+            try:
+                self.store.flush()
+            finally:
+                self._local.flushing = False
+
+
+def test_update_merges_with_a_record_flushed_mid_update(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    store.put("job", {"status": "processing", "metrics": {"decoded_frames": 10}})
+    store._lock = FlushAfterRelease(store)
+
+    store.update("job", progress={"percent": 5})
+    store.update("job", status="rendering")
+
+    assert store.get("job") == {
+        "status": "rendering",
+        "metrics": {"decoded_frames": 10},
+        "progress": {"percent": 5},
+    }
+
+
+def test_concurrent_updates_survive_flushes(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+    store.put("job", {"status": "processing"})
+    stop = threading.Event()
+
+    def flusher():
+        while not stop.is_set():
+            store.flush()
+
+    # Every update adds a new key, so a single lost merge shows at the end
+    def writer(n):
+        for i in range(300):
+            store.update("job", **{f"w{n}_{i}": i})
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+    flushing = threading.Thread(target=flusher)
+
+    # Switch threads as often as possible, so flushes land between every
+    # step of an update
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        flushing.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        stop.set()
+        flushing.join()
+        sys.setswitchinterval(interval)
+    store.flush()
+
+    expected = {"status": "processing", **{f"w{n}_{i}": i for n in range(4) for i in range(300)}}
+    assert store.get("job") == expected
+    # ...and the committed row agrees with the buffer
+    assert SQLiteJobStore(str(tmp_path / "jobs.db")).get("job") == expected
+
+
+def test_flushed_jobs_are_visible_to_another_process(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = SQLiteJobStore(path)
+    store.put("job", {"status": "rendering", "progress": {"percent": 40}})
+    store.flush()
+
+    reader = (
+        "import sys, json; sys.path.insert(0, sys.argv[1]);"
+        "from job_store import SQLiteJobStore;"
+        "print(json.dumps(SQLiteJobStore(sys.argv[2]).get('job')))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", reader, BACKEND_DIR, path],
+        capture_output=True, text=True, check=True
+    ).stdout
+
+    # The reader's startup must not have failed the job either
+    assert json.loads(out) == {"status": "rendering", "progress": {"percent": 40}}
+
+
+def test_jobs_of_a_silent_process_are_failed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    old = SQLiteJobStore(path)
+    old.put("running", {"status": "rendering"})
+    old.put("finished", {"status": "done", "clips": []})
+    old.flush()
+
+    # The old process stopped sending heartbeats long enough ago
+    with old._connect() as conn:
+        conn.execute(
+            "UPDATE workers SET seen = ? WHERE owner = ?",
+            (time.time() - ORPHAN_AFTER - 1, old.owner)
+        )
+
+    new = SQLiteJobStore(path)
+    new.put("mine", {"status": "queued"})
+    new.flush()
+    new.fail_orphans()
+
+    assert new.get("running") == {"status": "error"}
+    assert new.get("finished") == {"status": "done", "clips": []}
+    assert new.get("mine") == {"status": "queued"}
+
+
+def test_jobs_of_a_live_process_are_left_alone(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    live = SQLiteJobStore(path)
+    live.put("running", {"status": "rendering"})
+    live.flush()
+
+    SQLiteJobStore(path).fail_orphans()
+
+    assert live.get("running") == {"status": "rendering"}
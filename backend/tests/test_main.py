@@ -0,0 +1,133 @@
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+import main
+from probe import probe
+from conftest import requires_ffmpeg
+
+
+@pytest.fixture
+def app_dirs(tmp_path, monkeypatch):
+    """Points main's upload, clip and feature folders at a temp dir."""
+    for name in ("UPLOADS_DIR", "CLIPS_DIR", "FEATURES_DIR"):
+        folder = tmp_path / name.lower()
+        folder.mkdir()
+        monkeypatch.setattr(main, name, str(folder))
+    return tmp_path
+
+
+@requires_ffmpeg
+def test_previews_match_the_planned_windows(av_video, app_dirs, monkeypatch):
+    # Close enough together to be rendered as one group
+    windows = [(5.0, 4.0), (12.0, 3.0), (30.0, 4.0)]
+    monkeypatch.setattr(main, "pick_windows", lambda *args: (windows, 0))
+    monkeypatch.setattr(main, "PREVIEW_CLIPS", True)
+
+    # Previews are deleted once the final clips exist, so measure them as
+    # soon as they are published
+    durations = []
+    update = main.jobs.update
+
+    def record_previews(job_id, **fields):
+        for link in fields.get("previews", []):
+            path = os.path.join(main.CLIPS_DIR, link["url"].rsplit("/", 1)[1])
+            durations.append([float(s["duration"]) for s in probe(path)["streams"]])
+        return update(job_id, **fields)
+
+    monkeypatch.setattr(main.jobs, "update", record_previews)
+
+    main.jobs.put("job", {"status": "queued"})
+    main.process_video("job", [av_video], "key", len(windows), 4, shape="1:1")
+
+    assert main.jobs.get("job")["status"] == "done"
+    assert len(durations) == len(windows)
+    for (_, length), streams in zip(windows, durations):
+        assert len(streams) == 2
+        for duration in streams:
+            assert abs(duration - length) < 0.15
+
+
+class DisconnectingUpload:
+    """UploadFile stand-in whose client goes away after the first chunk."""
+
+    def __init__(self):
+        self.chunks = [b"x" * 1024]
+
+    async def read(self, size):
+        if not self.chunks:
+            raise ConnectionResetError("client disconnected")
+        return self.chunks.pop()
+
+
+def test_interrupted_upload_leaves_no_job(app_dirs, monkeypatch):
+    monkeypatch.setattr(main.uuid, "uuid4", lambda: "upload-job")
+
+    with pytest.raises(ConnectionResetError):
+        asyncio.run(main.process(
+            DisconnectingUpload(), clip_count=3, clip_length=8,
+            quality=main.DEFAULT_QUALITY, shape=main.DEFAULT_SHAPE, analysis="full"
+        ))
+
+    assert main.jobs.get("upload-job") is None
+    assert os.listdir(main.UPLOADS_DIR) == []
+
+
+def test_pruning_keeps_inputs_of_queued_jobs(app_dirs, monkeypatch):
+    queued = os.path.join(main.UPLOADS_DIR, "queued.mp4")
+    stale = os.path.join(main.UPLOADS_DIR, "stale.mp4")
+    old = time.time() - 2 * main.UPLOAD_TTL
+    for path in (queued, stale):
+        open(path, "wb").close()
+        os.utime(path, (old, old))
+
+    main.hold_inputs([queued])
+    try:
+        monkeypatch.setattr(main, "last_prune", 0.0)
+        main.maybe_prune_uploads()
+    finally:
+        main.release_inputs([queued])
+
+    assert os.path.exists(queued)
+    assert not os.path.exists(stale)
+    assert queued not in main.pending_inputs
+
+
+def test_dequeued_input_counts_as_used(app_dirs, monkeypatch):
+    path = os.path.join(main.UPLOADS_DIR, "input.mp4")
+    open(path, "wb").close()
+    old = time.time() - 2 * main.UPLOAD_TTL
+    os.utime(path, (old, old))
+
+    # Stop right after the job has started
+    def fail(*args):
+        raise Exception("stop")
+
+    monkeypatch.setattr(main, "pick_windows", fail)
+    main.jobs.put("job", {"status": "queued"})
+    main.process_video("job", [path], "key")
+
+    assert main.jobs.get("job")["status"] == "error"
+    assert os.path.getmtime(path) > time.time() - 60
+
+
+def test_events_read_the_job_store_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def job_status(job_id):
+        threads.append(threading.get_ident())
+        return {"status": "done", "clips": []}
+
+    monkeypatch.setattr(main, "job_status", job_status)
+
+    async def read_stream():
+        response = await main.events("job")
+        return [chunk async for chunk in response.body_iterator], threading.get_ident()
+
+    chunks, loop_thread = asyncio.run(read_stream())
+
+    assert chunks == ['event: status\ndata: {"status": "done", "clips": []}\n\n']
+    assert threads and loop_thread not in threads
@@ -0,0 +1,149 @@
+import os
+from email.utils import formatdate
+
+import anyio
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from media import MediaFileResponse
+
+BODY = bytes(range(256)) * 40  # 10240 bytes
+
+
+@pytest.fixture
+def media_file(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(BODY)
+    return str(path)
+
+
+@pytest.fixture
+def client(media_file):
+    def serve(request):
+        return MediaFileResponse(
+            media_file,
+            request.headers,
+            media_type="video/mp4",
+            immutable=True,
+            head=request.method == "HEAD"
+        )
+
+    app = Starlette(routes=[Route("/clip", serve, methods=["GET", "HEAD"])])
+    return TestClient(app)
+
+
+def test_full_body(client):
+    r = client.get("/clip")
+    assert r.status_code == 200
+    assert r.content == BODY
+    assert r.headers["content-length"] == str(len(BODY))
+    assert r.headers["accept-ranges"] == "bytes"
+    assert "immutable" in r.headers["cache-control"]
+
+
+@pytest.mark.parametrize("header, first, last", [
+    ("bytes=0-99", 0, 99),
+    ("bytes=10000-", 10000, len(BODY) - 1),
+    ("bytes=-240", len(BODY) - 240, len(BODY) - 1),
+    ("bytes=10200-99999", 10200, len(BODY) - 1),
+])
+def test_single_range(client, header, first, last):
+    r = client.get("/clip", headers={"Range": header})
+    assert r.status_code == 206
+    assert r.content == BODY[first:last + 1]
+    assert r.headers["content-range"] == f"bytes {first}-{last}/{len(BODY)}"
+    assert r.headers["content-length"] == str(last - first + 1)
+
+
+@pytest.mark.parametrize("header", ["bytes=0-9,20-29", "bytes=20000-", "bytes=-0", "bytes=50-10"])
+def test_unsatisfiable_range(client, header):
+    r = client.get("/clip", headers={"Range": header})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(BODY)}"
+    assert r.content == b""
+
+
+def test_malformed_range_is_ignored(client):
+    r = client.get("/clip", headers={"Range": "items=0-5"})
+    assert r.status_code == 200
+    assert r.content == BODY
+
+
+def test_if_none_match(client):
+    etag = client.get("/clip").headers["etag"]
+
+    r = client.get("/clip", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert "content-type" not in r.headers
+    assert r.headers["etag"] == etag
+
+    assert client.get("/clip", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    assert client.get("/clip", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since(client, media_file):
+    mtime = os.stat(media_file).st_mtime
+
+    r = client.get("/clip", headers={"If-Modified-Since": formatdate(mtime + 60, usegmt=True)})
+    assert r.status_code == 304
+
+    r = client.get("/clip", headers={"If-Modified-Since": formatdate(mtime - 60, usegmt=True)})
+    assert r.status_code == 200
+
+    # If-None-Match wins when both are sent
+    r = client.get("/clip", headers={
+        "If-None-Match": '"other"',
+        "If-Modified-Since": formatdate(mtime + 60, usegmt=True),
+    })
+    assert r.status_code == 200
+
+
+def test_if_range(client):
+    etag = client.get("/clip").headers["etag"]
+
+    r = client.get("/clip", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert r.status_code == 206
+    assert r.content == BODY[:10]
+
+    # Stale validator: the whole, current file is sent instead
+    r = client.get("/clip", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert r.status_code == 200
+    assert r.content == BODY
+
+
+def test_head(client):
+    r = client.head("/clip")
+    assert r.status_code == 200
+    assert r.content == b""
+    assert r.headers["content-length"] == str(len(BODY))
+
+    r = client.head("/clip", headers={"Range": "bytes=0-99"})
+    assert r.status_code == 206
+    assert r.content == b""
+    assert r.headers["content-length"] == "100"
+
+
+def test_zerocopysend(media_file):
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def run():
+        response = MediaFileResponse(
+            media_file, {"range": "bytes=100-199"}, media_type="video/mp4"
+        )
+        scope = {"type": "http", "extensions": {"http.response.zerocopysend": {}}}
+        await response(scope, None, send)
+
+    anyio.run(run)
+
+    start, body = messages
+    assert start["status"] == 206
+    assert body["type"] == "http.response.zerocopysend"
+    assert body["offset"] == 100 and body["count"] == 100
+    # A file object, as the extension specifies, not a bare descriptor
+    assert hasattr(body["file"], "fileno")
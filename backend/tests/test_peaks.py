@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from analysis import FEATURES
+from audio_peaks import HOP
+from peaks import SNAP_DISTANCE, snap_windows
+
+
+def features(seconds, shots=(), pauses=()):
+    """Flat features with hard cuts and quiet hops at the given times."""
+    rows = np.zeros(int(seconds / HOP), dtype=FEATURES)
+    rows["loudness"] = -20.0
+    for t in shots:
+        rows["cuts"][int(t / HOP)] = 1.0
+    for t in pauses:
+        rows["loudness"][int(t / HOP)] = -60.0
+    return rows
+
+
+def test_no_windows():
+    assert snap_windows(features(60, shots=[10]), []) == []
+
+
+def test_nothing_to_snap_to():
+    # No cuts, and loudness that never varies has no pauses either
+    assert snap_windows(features(60), [(10.0, 8.0)]) == [(10.0, 8.0)]
+
+
+def test_boundaries_move_onto_a_single_nearby_shot():
+    assert snap_windows(features(60, shots=[10.5]), [(10.0, 8.0)]) == [(10.5, 7.5)]
+
+
+def test_boundaries_beyond_the_snap_distance_stay():
+    shot = 10.0 + SNAP_DISTANCE + HOP
+    assert snap_windows(features(60, shots=[shot]), [(10.0, 8.0)]) == [(10.0, 8.0)]
+
+
+def test_shots_win_over_pauses():
+    # The pause is closer, but a shot change is the better cut
+    rows = features(60, shots=[10.75], pauses=[10.0])
+    assert snap_windows(rows, [(10.0, 8.0)])[0][0] == 10.75
+
+
+def test_pauses_are_used_without_shots():
+    # A cut in the middle of the quiet hop
+    start, length = snap_windows(features(60, pauses=[17.5]), [(10.0, 8.0)])[0]
+    assert (start, start + length) == (10.0, 17.5 + HOP / 2)
+
+
+def test_equidistant_shots_pick_the_earlier_one():
+    assert snap_windows(features(60, shots=[9.5, 10.5]), [(10.0, 8.0)])[0][0] == 9.5
+
+
+def test_end_never_runs_past_the_source():
+    start, length = snap_windows(features(20, shots=[19.75]), [(12.0, 8.0)])[0]
+    assert start + length <= 20.0
+
+
+def test_a_clip_never_collapses():
+    # Both edges of a short window would land on the same shot
+    assert snap_windows(features(60, shots=[10.5]), [(10.0, 1.0)]) == [(10.0, 1.0)]
+
+
+@pytest.mark.parametrize("windows", [[(0.0, 8.0), (30.0, 8.0)], [(52.0, 8.0)]])
+def test_windows_at_the_edges_of_the_source(windows):
+    snapped = snap_windows(features(60, shots=[0.5, 59.5]), windows)
+    for start, length in snapped:
+        assert 0.0 <= start and start + length <= 60.0 and length > 0
@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+import scheduler
+from scheduler import JobScheduler
+
+
+@pytest.mark.skipif(not hasattr(os, "sched_getaffinity"), reason="no CPU affinity")
+def test_default_workers_follow_the_affinity_mask(monkeypatch):
+    # e.g. a 2-CPU cpuset on a 64-core host
+    monkeypatch.setattr(scheduler.os, "cpu_count", lambda: 64)
+    monkeypatch.setattr(scheduler.os, "sched_getaffinity", lambda pid: {4, 5})
+
+    pool = JobScheduler()
+
+    assert pool.workers == 2
+    assert pool.thread_budget() == 2
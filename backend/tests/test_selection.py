@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from selection import window_scores, top_windows, select_windows
+
+
+def naive_windows(curve, window, k, valid=None):
+    """Rescores every window from scratch for each pick; earliest wins ties."""
+    chosen = []
+    for _ in range(k):
+        best, best_score = None, -np.inf
+        for start in range(len(curve) - window + 1):
+            if any(abs(start - other) < window for other, _ in chosen):
+                continue
+            if valid is not None and not valid[start:start + window].all():
+                continue
+            score = curve[start:start + window].sum() / window
+            if score > best_score:
+                best, best_score = start, score
+        if best is None:
+            break
+        chosen.append((best, best_score))
+    return chosen
+
+
+def test_window_scores_are_window_means():
+    curve = np.array([1.0, 2.0, 3.0, 4.0])
+    assert window_scores(curve, 2).tolist() == [1.5, 2.5, 3.5]
+
+
+def test_ties_go_to_the_earlier_start():
+    # Eight starts tie for the best score, but only k * 2 * window = 4 of
+    # them fit in the candidate set
+    scores = np.array([
+        2, 0, 2, 2, 3, 1, 1, 0, 0, 0, 1, 0, 2, 0, 2, 2, 1,
+        1, 3, 3, 1, 3, 0, 3, 1, 2, 2, 3, 1, 3, 3, 0, 0,
+    ], dtype=float)
+    assert top_windows(scores, 1, 2) == [4, 18]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_naive_selector(seed):
+    rng = np.random.default_rng(seed)
+
+    for _ in range(300):
+        n = int(rng.integers(1, 80))
+        # Small integers: plenty of ties, and exact window means
+        curve = rng.integers(0, 4, n).astype(float)
+        window = int(rng.integers(1, 6))
+        k = int(rng.integers(1, 5))
+        valid = rng.random(n) > 0.1 if rng.random() < 0.5 else None
+
+        assert select_windows(curve, window, k, valid) == naive_windows(curve, window, k, valid)
+
+
+def test_short_or_empty_input():
+    assert select_windows(np.ones(3), 4, 2) == []
+    assert top_windows(np.zeros(0), 2, 3) == []
+    assert top_windows(np.ones(5), 2, 0) == []
+
+
+def test_windows_never_touch_invalid_samples():
+    curve = np.array([9.0, 9.0, 9.0, 1.0, 1.0, 1.0])
+    valid = np.array([True, False, True, True, True, True])
+
+    assert [start for start, _ in select_windows(curve, 2, 3, valid)] == [2, 4]
@@ -0,0 +1,121 @@
+import os
+import functools
+import subprocess
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+import pytest
+from yt_dlp.postprocessor import FFmpegFixupM3u8PP
+from yt_dlp.postprocessor.common import PostProcessorMetaClass
+from yt_dlp.utils import PostProcessingError
+
+import probe
+import url_handler
+from conftest import requires_ffmpeg
+
+pytestmark = requires_ffmpeg
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def hls_url(tmp_path_factory):
+    """A 30 s HLS stream (2 s segments) served over local HTTP."""
+    folder = tmp_path_factory.mktemp("hls")
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", "testsrc=s=320x240:r=25:d=30",
+            "-f", "lavfi", "-i", "sine=d=30",
+            "-c:v", "libx264", "-g", "50", "-c:a", "aac", "-shortest",
+            "-f", "hls", "-hls_time", "2", "-hls_playlist_type", "vod",
+            str(folder / "index.m3u8")
+        ],
+        check=True
+    )
+
+    handler = functools.partial(QuietHandler, directory=str(folder))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    yield f"http://127.0.0.1:{server.server_port}/index.m3u8"
+    server.shutdown()
+
+
+def flaky(monkeypatch, failures):
+    """
+    Makes the first `failures` yt-dlp runs raise, like a dropped connection,
+    and skips the sleeps between attempts.
+    """
+    monkeypatch.setattr(url_handler, "_backoff", lambda n: 0)
+    calls = []
+    real = url_handler._extract
+
+    def extract(*args, **kwargs):
+        calls.append(1)
+        if len(calls) <= failures:
+            raise OSError("connection reset")
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(url_handler, "_extract", extract)
+    return calls
+
+
+def test_backoff_doubles_from_one_second():
+    # yt-dlp calls the sleep function with n = 0 before the first retry
+    assert [url_handler._backoff(n) for n in range(4)] == [1, 2, 4, 8]
+    assert url_handler._backoff(10) == 30
+
+
+def test_download_video_from_hls(hls_url, tmp_path):
+    path = url_handler.download_video(hls_url, str(tmp_path))
+    assert path and os.path.exists(path)
+    assert abs(probe.duration(path) - 30) < 1
+
+
+def test_download_sections_from_hls(hls_url, tmp_path):
+    sections = [(4.0, 8.0), (20.0, 24.0)]
+    paths = url_handler.download_sections(hls_url, str(tmp_path), sections)
+
+    assert paths and len(paths) == 2
+    for path in paths:
+        assert abs(probe.duration(path) - 4) < 1
+
+
+def test_download_sections_retries(hls_url, tmp_path, monkeypatch):
+    calls = flaky(monkeypatch, failures=1)
+
+    paths = url_handler.download_sections(hls_url, str(tmp_path), [(4.0, 8.0)])
+
+    assert len(calls) == 2
+    assert paths and os.path.exists(paths[0])
+
+
+def test_download_gives_up_after_all_attempts(hls_url, tmp_path, monkeypatch):
+    calls = flaky(monkeypatch, failures=url_handler.DOWNLOAD_ATTEMPTS)
+
+    assert url_handler.download_video(hls_url, str(tmp_path)) is None
+    assert len(calls) == url_handler.DOWNLOAD_ATTEMPTS
+
+
+def test_failed_fixup_is_redone(hls_url, tmp_path, monkeypatch):
+    monkeypatch.setattr(url_handler, "_backoff", lambda n: 0)
+    fixups = []
+
+    def run(self, info):
+        fixups.append(info["filepath"])
+        if len(fixups) == 1:
+            raise PostProcessingError("ffprobe crashed")
+        return [], info
+
+    # Wrapped like any postprocessor's run(), so the hooks still fire
+    monkeypatch.setattr(FFmpegFixupM3u8PP, "run", PostProcessorMetaClass.run_wrapper(run))
+
+    path = url_handler.download_video(hls_url, str(tmp_path))
+
+    # The second attempt downloads again rather than keeping the unfixed file
+    assert len(fixups) == 2
+    assert path == fixups[1] and os.path.exists(path)
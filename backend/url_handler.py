@@ -2,60 +2,329 @@
 # IMPORTS
 # =======================
 import os
+import time
 import uuid
 import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import download_range_func
+
+import probe
+
+# Only with ALLOW_FILE_URLS=1 may file:// links be "downloaded" (offline
+# testing); never enable it on a public server.
+ALLOW_FILE_URLS = os.environ.get("ALLOW_FILE_URLS") == "1"
+
+# Download best quality MP4 up to 720p (faster & lighter)
+VIDEO_FORMAT = "bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/mp4"
+
+# Whole-download attempts; yt-dlp resumes the .part file on each retry
+DOWNLOAD_ATTEMPTS = 3
+
+
+def _backoff(n):
+    # yt-dlp passes n = retries so far - 1, i.e. 0 before the first retry:
+    # 1s, 2s, 4s, ... capped at 30s between retries of one request
+    return min(30, 2 ** n)
+
+
+# Shared yt-dlp configuration
+BASE_OPTS = {
+    "format": VIDEO_FORMAT,
+
+    # Avoid SSL certificate issues
+    "nocheckcertificate": True,
+
+    # Suppress unnecessary logs
+    "quiet": True,
+    "no_warnings": True,
+    "noprogress": True,
+
+    # DASH/HLS: fetch several fragments at once instead of one by one
+    "concurrent_fragment_downloads": int(os.environ.get("FRAGMENT_WORKERS", 4)),
+
+    # Keep and resume partial downloads; retry failed requests with
+    # exponential backoff instead of starting over
+    "continuedl": True,
+    "retries": 10,
+    "fragment_retries": 10,
+    "retry_sleep_functions": {"http": _backoff, "fragment": _backoff},
+}
+
+
+# =======================
+# LOCAL STAND-IN EXTRACTOR
+# =======================
+class LocalFileIE(InfoExtractor):
+    """
+    Treats a file:// URL like a hosted video, so the metadata and section
+    download paths can be exercised without network access.
+    """
+
+    IE_NAME = "localfile"
+    _VALID_URL = r"file://(?P<path>/.+)"
+
+    def _real_extract(self, url):
+        path = self._match_valid_url(url).group("path")
+
+        return {
+            "id": os.path.splitext(os.path.basename(path))[0],
+            "title": os.path.basename(path),
+            "url": url,
+            "ext": "mp4",
+            # Lets yt-dlp hand ranged downloads to ffmpeg, which reads
+            # file:// URLs natively
+            "protocol": "http",
+            "duration": probe.duration(path),
+        }
+
+
+class OutputTracker:
+    """
+    Records where yt-dlp actually put each downloaded file.
+
+    yt-dlp may rename its output (merging streams into another container,
+    remuxing, ...). Its progress and postprocessor hooks report the real
+    paths, so nobody has to guess by scanning the download folder.
+    Files are keyed by section start (None for whole-video downloads).
+
+    It also remembers files a postprocessor started on but never finished,
+    so a failed fixup or merge is not mistaken for a finished download.
+
+    Parameters:
+    on_progress (callable | None): Called with {"bytes", "total", "speed",
+    "eta"} (bytes/sec and seconds) at most twice a second while downloading
+    """
+
+    def __init__(self, on_progress=None):
+        self.paths = {}
+        self.on_progress = on_progress
+        self._last_report = 0.0
+        self._unprocessed = {}
+
+    def progress_hook(self, d):
+        if d["status"] == "downloading" and self.on_progress:
+            now = time.monotonic()
+            if now - self._last_report >= 0.5:
+                self._last_report = now
+                self.on_progress({
+                    "bytes": d.get("downloaded_bytes"),
+                    "total": d.get("total_bytes") or d.get("total_bytes_estimate"),
+                    "speed": d.get("speed"),
+                    "eta": d.get("eta"),
+                })
+
+        # The downloaded file, before any postprocessing
+        if d["status"] == "finished":
+            info = d.get("info_dict") or {}
+            self.paths[info.get("section_start")] = d["filename"]
+
+    def postprocessor_hook(self, d):
+        # Every finished postprocessor reports the file it left behind;
+        # MoveFiles runs last and reports the final location
+        info = d["info_dict"]
+        key = info.get("section_start")
+
+        if d["status"] == "started" and info.get("filepath"):
+            self._unprocessed[(key, info["filepath"])] = d.get("postprocessor")
+
+        if d["status"] == "finished":
+            self._unprocessed.pop((key, info.get("filepath")), None)
+            if info.get("filepath"):
+                self.paths[key] = info["filepath"]
+
+    def discard_unprocessed(self):
+        """
+        Deletes every file a postprocessor failed on.
+
+        yt-dlp would report such a file as already downloaded on the next
+        attempt and skip its postprocessing. Partial and per-format files
+        are kept, so the download itself still resumes.
+        """
+        for (key, path), postprocessor in self._unprocessed.items():
+            print(f"Discarding {path} ({postprocessor} did not finish)")
+            if os.path.exists(path):
+                os.remove(path)
+            self.paths.pop(key, None)
+        self._unprocessed.clear()
+
+    def opts(self):
+        return {
+            "progress_hooks": [self.progress_hook],
+            "postprocessor_hooks": [self.postprocessor_hook],
+        }
+
+
+def _extract(url, opts, download):
+    """Runs yt-dlp's extract_info with BASE_OPTS plus `opts`."""
+    params = {**BASE_OPTS, **opts}
+    ie_key = None
+
+    if ALLOW_FILE_URLS and url.startswith("file://"):
+        params["enable_file_urls"] = True
+        ie_key = "LocalFile"
+
+    with yt_dlp.YoutubeDL(params) as ydl:
+        if ie_key:
+            ydl.add_info_extractor(LocalFileIE())
+        return ydl.extract_info(url, download=download, ie_key=ie_key)
+
+
+def _download(url, opts, tracker, keys, what):
+    """
+    Runs a download, retrying the whole of it up to DOWNLOAD_ATTEMPTS times.
+
+    The output template is the same on every attempt, so yt-dlp resumes
+    partial files and skips files that were already completed.
+
+    Parameters:
+    keys (list): OutputTracker keys of the files the download must produce
+
+    Returns:
+    list[str] | None: The files for `keys`, or None on failure
+    """
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        try:
+            _extract(url, opts, download=True)
+
+            # The hooks tell us exactly which files this download produced
+            paths = [tracker.paths.get(key) for key in keys]
+            if all(path and os.path.exists(path) for path in paths):
+                return paths
+
+            return None
+
+        except Exception as e:
+            print(f"{what} failed (attempt {attempt}/{DOWNLOAD_ATTEMPTS}):", e)
+            tracker.discard_unprocessed()
+            if attempt < DOWNLOAD_ATTEMPTS:
+                # Longer than the per-request backoff: 4s, then 8s
+                time.sleep(_backoff(attempt + 1))
+
+    return None
+
 
 # =======================
 # VIDEO DOWNLOAD FUNCTION
 # =======================
-def download_video(url, upload_folder):
+def download_video(url, upload_folder, on_progress=None):
     """
     Downloads a video from a given URL using yt-dlp.
 
     Parameters:
     url (str): Video URL (YouTube, Instagram, etc.)
     upload_folder (str): Folder where the video will be saved
+    on_progress (callable | None): Receives download speed/ETA updates
 
     Returns:
     str | None: Path of downloaded video if successful, else None
     """
 
-    # Generate a unique filename to avoid conflicts
-    filename = f"video_{uuid.uuid4().hex}.mp4"
-    filepath = os.path.join(upload_folder, filename)
+    # Generate a unique filename to avoid conflicts; yt-dlp fills in the
+    # extension it ends up using
+    filename = f"video_{uuid.uuid4().hex}.%(ext)s"
+    tracker = OutputTracker(on_progress)
 
-    # yt-dlp configuration
-    ydl_opts = {
-        # Save video at this exact location
-        "outtmpl": filepath,
+    opts = {
+        "outtmpl": os.path.join(upload_folder, filename),
+        "merge_output_format": "mp4",
+        **tracker.opts(),
+    }
 
-        # Download best quality MP4 up to 720p (faster & lighter)
-        "format": "bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/mp4",
+    paths = _download(url, opts, tracker, [None], "Video download")
+    return paths[0] if paths else None
 
-        # Avoid SSL certificate issues
-        "nocheckcertificate": True,
 
-        # Suppress unnecessary logs
-        "quiet": True,
-        "no_warnings": True,
-    }
+# =======================
+# SECTION DOWNLOADS
+# =======================
+def fetch_info(url):
+    """
+    Reads a video's metadata (duration, heatmap, ...) without downloading it.
 
+    Returns:
+    dict | None: yt-dlp info dict, or None if the URL cannot be resolved
+    """
     try:
-        # First attempt: normal download
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
+        return _extract(url, {}, download=False)
+    except Exception as e:
+        print("Video info failed:", e)
+        return None
 
-        # Check if file exists
-        if os.path.exists(filepath):
-            return filepath
 
-        # Fallback: return any recently created MP4 file
-        for file in os.listdir(upload_folder):
-            if file.endswith(".mp4"):
-                return os.path.join(upload_folder, file)
+def choose_sections(info, clip_length, count):
+    """
+    Picks the parts of a video worth downloading for `count` clips.
 
-        return None
+    Each section is twice the clip length, leaving room for peak detection
+    to place the clip inside it. Sites that publish a "most replayed"
+    heatmap decide where the sections go; otherwise they are spread evenly.
 
-    except Exception as e:
-        print("Video download failed:", e)
-        return None
+    Parameters:
+    info (dict): Metadata from fetch_info
+    clip_length (float): Clip length in seconds
+    count (int): Number of clips wanted
+
+    Returns:
+    list[tuple[float, float]]: Sorted (start, end) pairs in seconds
+    """
+    duration = info.get("duration") or 0
+    section = clip_length * 2
+
+    if duration <= section * count:
+        return [(0.0, float(duration))]
+
+    heatmap = sorted(
+        info.get("heatmap") or [],
+        key=lambda h: h.get("value", 0),
+        reverse=True
+    )
+    centers = []
+
+    for h in heatmap:
+        center = (h["start_time"] + h["end_time"]) / 2
+        if all(abs(center - c) >= section for c in centers):
+            centers.append(center)
+        if len(centers) == count:
+            break
+
+    if len(centers) < count:
+        step = duration / (count + 1)
+        centers = [step * (i + 1) for i in range(count)]
+
+    sections = []
+    for center in sorted(centers):
+        start = min(max(0.0, center - section / 2), duration - section)
+        sections.append((start, start + section))
+
+    return sections
+
+
+def download_sections(url, upload_folder, sections, on_progress=None):
+    """
+    Downloads only the given time ranges of a video.
+
+    yt-dlp fetches just the fragments (or byte ranges) covering each
+    section, so a few short clips from a multi-hour stream cost megabytes
+    instead of gigabytes. A failed download is retried like download_video;
+    sections finished by an earlier attempt are not fetched again.
+
+    Parameters:
+    url (str): Video URL
+    upload_folder (str): Folder where the sections will be saved
+    sections (list[tuple[float, float]]): (start, end) pairs in seconds
+    on_progress (callable | None): Receives download speed/ETA updates
+
+    Returns:
+    list[str] | None: One file per section in time order, or None on failure
+    """
+    prefix = f"section_{uuid.uuid4().hex}"
+    tracker = OutputTracker(on_progress)
+
+    opts = {
+        "outtmpl": os.path.join(upload_folder, f"{prefix}_%(section_start)010.3f.%(ext)s"),
+        "merge_output_format": "mp4",
+        "download_ranges": download_range_func(None, sections),
+        **tracker.opts(),
+    }
+
+    return _download(url, opts, tracker, [start for start, _ in sections], "Section download")